@@ -1,33 +1,260 @@
 __author__ = "David Guriel"
 from Screeve import *
-import pandas as pd
-import argparse
-from datetime import datetime
+from profiling import profiled
+from sinks import make_sink, SINKS_FORMATS
+import io
+# Note: the heavier modules (pandas, pickle, hashlib, the process pool) are imported where they're used, so that importing
+# this module - e.g. by the workers, or by a run whose lexicon is cached - stays cheap. See bench_imports.py.
 class Conjugation:
-    def __init__(self, screeves_list:[Screeve]):
+    def __init__(self, screeves_list:[Screeve], name=None):
         self.screeves = screeves_list
+        self.name = name or type(screeves_list[0]).__name__.replace('_Screeve', '') # e.g. 'Transitive', for the profiling
 
     def gen_paradigm(self, lemma:Lemma, use_unimorph_format, verbose, f):
-        lemma.generate_clean_paradigm(self.screeves, use_unimorph_format, verbose, f)
+        with profiled(f'class:{self.name}', f'lemma:{lemma.translation}'):
+            lemma.generate_clean_paradigm(self.screeves, use_unimorph_format, verbose, f)
+
+    def write_paradigm(self, lemma:Lemma, sink):
+        """generates the lemma's paradigm into a sink - see sinks.py"""
+        with profiled(f'class:{self.name}', f'lemma:{lemma.translation}'):
+            lemma.write_paradigm(self.screeves, sink)
+
+    def iter_forms(self, lemma:Lemma):
+        """yields the FormRecords of the lemma's paradigm lazily - see Lemma.iter_forms"""
+        return lemma.iter_forms(self.screeves)
+
+    def iter_paradigms(self, lemmas:[Lemma]):
+        for lemma in lemmas:
+            yield from lemma.iter_forms(self.screeves)
+
+    def gen_paradigm_array(self, lemma:Lemma):
+        """returns the lemma's paradigm as a fixed-length list of forms, indexed by the cells' codes - see cells.py"""
+        from cells import paradigm_array
+        return paradigm_array(lemma.iter_forms(self.screeves))
+
+    def gen_paradigms_batch(self, lemmas:[Lemma]):
+        """Generates the forms of many lemmas of this class at once - see batch_generation.gen_paradigms_batch"""
+        from batch_generation import gen_paradigms_batch
+        return gen_paradigms_batch(self.screeves, lemmas)
 
     @staticmethod
-    def gen_lemma_object(row, conj):
+    def gen_lemma_object(values, conj):
         if conj=='tv':
-            obj = Transitive_Lemma(*row.tolist())
+            obj = Transitive_Lemma(*values)
         elif conj=='itv':
-            obj = Intransitive_Lemma(*row.tolist())
+            obj = Intransitive_Lemma(*values)
         elif conj=='med':
-            obj = Medial_Lemma(*row.tolist())
+            obj = Medial_Lemma(*values)
         elif conj=='ind':
-            obj = Indirect_Lemma(*row.tolist())
+            obj = Indirect_Lemma(*values)
         elif conj=='stat':
-            obj = Stative_Lemma(*row.tolist())
+            obj = Stative_Lemma(*values)
         else:
             raise Exception("Unknown Conjugation class!")
         return obj
 
 
+CONJUGATIONS_NAMES = ['Transitive', 'Intransitive', 'Medial', 'Indirect', 'Stative']
+CONJUGATIONS_CODES = ['tv', 'itv', 'med', 'ind', 'stat']
+LEMMAS_CLASSES = [Transitive_Lemma, Intransitive_Lemma, Medial_Lemma, Indirect_Lemma, Stative_Lemma]
+# The declared schema of every sheet - the parameters of its *_Lemma constructor, in the order of the columns
+SHEETS_SCHEMAS = [list(cls.__init__.__code__.co_varnames[1:cls.__init__.__code__.co_argcount]) for cls in LEMMAS_CLASSES]
+SHEETS_WIDTHS = [len(schema) for schema in SHEETS_SCHEMAS] # Note the column add on the Excel! Columns beyond these are dropped.
+INTEGER_COLUMNS = {'idx', 'valency', 'lemma_formation'}
+SCREEVES_DEFINITIONS = [define_Transitive_Screeves, define_Intransitive_Screeves, define_Medial_Screeves, define_Indirect_Screeves, define_Stative_Screeves]
+LEXICON_CACHE_SUFFIX = '.lexicon.pkl'
+
+
+def validate_sheet_rows(rows, i):
+    """checks the rows of the i-th sheet against its schema - the integer columns are integers and the rest are strings"""
+    schema = SHEETS_SCHEMAS[i]
+    for row_num, row in enumerate(rows, start=2): # as numbered in Excel, after the header
+        if len(row) < len(schema):
+            raise Exception(f"Sheet {CONJUGATIONS_NAMES[i]} has {len(row)} columns, but {CONJUGATIONS_CODES[i]} lemmas have {len(schema)}!")
+        for column, value in zip(schema, row):
+            if column in INTEGER_COLUMNS:
+                if isinstance(value, str) or value != int(value):
+                    raise Exception(f"Sheet {CONJUGATIONS_NAMES[i]}, row {row_num}: '{column}' must be an integer, got {value!r}")
+            elif not isinstance(value, str):
+                raise Exception(f"Sheet {CONJUGATIONS_NAMES[i]}, row {row_num}: '{column}' must be a string, got {value!r}")
+
+
+def parse_lexicon(file_path):
+    """
+    Parses the 5 sheets of the Excel file - opening the workbook once - and validates them.
+    :return: a list of 5 lists (one per class, ordered as CONJUGATIONS_NAMES) of the rows' values, trimmed to the sheets' widths
+    """
+    import pandas as pd # only needed when the lexicon isn't cached - and it is the slowest import by far
+    sheets_rows = []
+    with pd.ExcelFile(file_path) as workbook:
+        for i in range(len(CONJUGATIONS_CODES)):
+            df = workbook.parse(sheet_name=i)
+            df = df.drop(columns=df.columns.tolist()[SHEETS_WIDTHS[i]:])
+            df = df.astype(object).fillna('') # object dtype, so that empty columns can also be filled with ''
+            rows = df.values.tolist()
+            validate_sheet_rows(rows, i)
+            sheets_rows.append(rows)
+    return sheets_rows
+
+
+def file_sha256(file_path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_lexicon(file_path, use_cache=True):
+    """
+    Returns the parsed rows of the Excel file (see parse_lexicon) through a sidecar cache (<file_path>.lexicon.pkl), which is
+    valid as long as the workbook's mtime - or else its content hash - didn't change.
+    """
+    import pickle
+    cache_path = file_path + LEXICON_CACHE_SUFFIX
+    mtime = os.stat(file_path).st_mtime
+    if use_cache and os.path.isfile(cache_path):
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['mtime'] == mtime:
+            return cache['sheets']
+        sha256 = file_sha256(file_path)
+        if cache['sha256'] == sha256: # touched, but not modified
+            cache['mtime'] = mtime
+            _write_lexicon_cache(cache, cache_path)
+            return cache['sheets']
+    sheets_rows = parse_lexicon(file_path)
+    if use_cache:
+        _write_lexicon_cache({'mtime': mtime, 'sha256': file_sha256(file_path), 'sheets': sheets_rows}, cache_path)
+    return sheets_rows
+
+
+def _write_lexicon_cache(cache, cache_path):
+    import pickle
+    with open(cache_path + '.tmp', 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + '.tmp', cache_path)
+
+
+def read_lemmas(file_path, use_cache=True):
+    """
+    Reads the 5 sheets of the Excel file into Lemma objects.
+    :return: a list of 5 dictionaries (one per class, ordered as CONJUGATIONS_NAMES), each mapping the 1-based row index to a Lemma.
+    """
+    with profiled('phase:excel'):
+        sheets_rows = read_lexicon(file_path, use_cache)
+    return [{(idx+1): Conjugation.gen_lemma_object(row, conj) for idx, row in enumerate(rows)}
+            for conj, rows in zip(CONJUGATIONS_CODES, sheets_rows)]
+
+
+def class_choice_of(c):
+    """returns the index of a class, given its name (e.g. 'Transitive') or its index (0-4, also as a string)"""
+    if str(c).isdigit() and int(c) < len(CONJUGATIONS_NAMES): return int(c)
+    if c in CONJUGATIONS_NAMES: return CONJUGATIONS_NAMES.index(c)
+    raise Exception(f"Unknown class {c!r} - expected one of {', '.join(CONJUGATIONS_NAMES)}, or an index 0-{len(CONJUGATIONS_NAMES)-1}")
+
+
+def select_lemmas(lemmas_dicts, classes=None, indices=None, translations=None):
+    """
+    Returns the (class_choice, lemma) pairs to generate, in a deterministic order - by class, then by row index.
+    :param classes: class names (e.g. 'Transitive') or indices 0-4. None means all the classes.
+    :param indices: row indices of lemmas (as in lemma_choices). None means all the rows.
+    :param translations: translation names (e.g. 'write'), as used for the files' names. None means all of them.
+    """
+    if classes is None:
+        class_choices = range(len(CONJUGATIONS_NAMES))
+    else:
+        class_choices = sorted({class_choice_of(c) for c in classes})
+    jobs = []
+    for class_choice in class_choices:
+        for idx, lemma in sorted(lemmas_dicts[class_choice].items()):
+            if indices is not None and idx not in indices: continue
+            if translations is not None and lemma.translation not in translations: continue
+            jobs.append((class_choice, lemma))
+    return jobs
+
+
+_conjugations = {} # class_choice -> Conjugation, defined once per process (the screeves aren't modified by the lemmas)
+
+def get_conjugation(class_choice):
+    if class_choice not in _conjugations:
+        _conjugations[class_choice] = Conjugation(SCREEVES_DEFINITIONS[class_choice](), CONJUGATIONS_NAMES[class_choice])
+    return _conjugations[class_choice]
+
+
+def gen_paradigm_text(class_choice, lemma, use_unimorph_format, verbose):
+    f = io.StringIO()
+    get_conjugation(class_choice).gen_paradigm(lemma, use_unimorph_format, verbose, f)
+    return f.getvalue()
+
+
+def _gen_paradigm_job(job):
+    # returns the text with its formulation stats - see merge_formulation_stats
+    class_choice, lemma, use_unimorph_format, verbose = job
+    return with_formulation_stats(gen_paradigm_text, class_choice, lemma, use_unimorph_format, verbose)
+
+
+def gen_sink_text(class_choice, lemma, sink_format):
+    f = io.StringIO()
+    with make_sink(sink_format, f) as sink:
+        get_conjugation(class_choice).write_paradigm(lemma, sink)
+    return f.getvalue()
+
+
+def _gen_sink_job(job): return with_formulation_stats(gen_sink_text, *job)
+
+
+def stream_paradigms(jobs, sink_format, file, workers=None):
+    """
+    Generates the paradigms of all the given (class_choice, lemma) pairs, in order, into a single stream, in a format of
+    sinks.make_sink (e.g. 'tsv' or 'jsonl'). With a single worker, the forms go into one sink over file, which is returned
+    (e.g. with the counts of a 'null' sink); otherwise every paradigm is formatted by a worker process, and None is returned.
+    """
+    if workers == 1:
+        with make_sink(sink_format, file) as sink:
+            for class_choice, lemma in jobs:
+                get_conjugation(class_choice).write_paradigm(lemma, sink)
+        return sink
+    from concurrent.futures import ProcessPoolExecutor
+    tasks = [(class_choice, lemma, sink_format) for class_choice, lemma in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_gen_sink_job, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1))))
+        for text in merge_formulation_stats(results):
+            file.write(text)
+
+
+def build_paradigms(jobs, use_unimorph_format, verbose, out_dir="Clean Paradigms", workers=None):
+    """
+    Generates the paradigms of all the given (class_choice, lemma) pairs over a process pool, and writes each one to
+    out_dir/<class name>/<translation>.txt. The files are written by the main process in the order of jobs.
+    :param workers: number of worker processes. None means os.cpu_count(), 1 means serial generation.
+    """
+    for dir_name in CONJUGATIONS_NAMES:
+        os.makedirs(os.path.join(out_dir, dir_name), exist_ok=True)
+    tasks = [(class_choice, lemma, use_unimorph_format, verbose) for class_choice, lemma in jobs]
+    if workers == 1:
+        texts = (text for text, _ in map(_gen_paradigm_job, tasks)) # the stats are already counted in this process
+        return _write_paradigms(jobs, texts, out_dir)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_gen_paradigm_job, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1))))
+        return _write_paradigms(jobs, merge_formulation_stats(results), out_dir)
+
+
+def _write_paradigms(jobs, texts, out_dir):
+    paths = []
+    for (class_choice, lemma), text in zip(jobs, texts):
+        path = os.path.join(out_dir, CONJUGATIONS_NAMES[class_choice], lemma.translation + ".txt")
+        with profiled('phase:write files'), open(path, 'w+', encoding='utf8') as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
 if __name__=='__main__':
+    import argparse
+    from datetime import datetime
     # For next time - update the README file!
     print(f"Exexuted on {datetime.now()}")
     parser = argparse.ArgumentParser()
@@ -35,59 +262,68 @@ if __name__=='__main__':
                                 "\nNote: execute this code only on verbs with valency>=2, otherwise syntactically wrong forms will be generated!!!")
     parser.add_argument('-v', '--verbose', help="Whether to print the output file with extra details", action="store_true")
     parser.add_argument('-u', "--use_unimorph_format", help="The meaning is implied from the name...", action="store_true")
+    parser.add_argument('-a', '--all', help="Batch mode - generate every lemma of every sheet", action="store_true")
+    parser.add_argument('-c', '--classes', nargs='+', choices=CONJUGATIONS_NAMES + [str(i) for i in range(len(CONJUGATIONS_NAMES))],
+                        help="Batch mode - generate only these classes (names like Transitive, or indices 0-4)")
+    parser.add_argument('-l', '--lemmas', nargs='+', type=int, help="Batch mode - generate only the lemmas with these row indices")
+    parser.add_argument('-t', '--translations', nargs='+', help="Batch mode - generate only the lemmas with these translations (e.g. write)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Batch mode - number of worker processes (default: number of CPUs)")
+    parser.add_argument('--profile', help="Record the timings per class, lemma, screeve and phase into this file (the generation runs serially)")
+    parser.add_argument('--profile_format', choices=['json', 'trace', 'folded'], default='json', help="json, a Chrome trace, or folded stacks for flamegraphs")
+    parser.add_argument('--no_cache', help="Parse the Excel file even if its cached lexicon is up to date", action="store_true")
+    parser.add_argument('-i', '--incremental', help="Batch mode - regenerate only the lemmas whose rows (or the code) changed since the last build", action="store_true")
+    parser.add_argument('--tables', nargs='?', const="Final Tables By Classes", help="Incremental mode - also splice the regenerated lemmas into these merged tables")
+    parser.add_argument('--dataset', nargs='?', const="katVerbsCompleteDataset.txt", help="Incremental mode - also splice the regenerated lemmas into this complete dataset")
+    parser.add_argument('--shards', type=int, help="Batch mode - write the output into this many lemma-hash buckets per class, instead of a file per lemma")
+    parser.add_argument('--compression', choices=['none', 'gzip', 'xz', 'zstd'], default='gzip', help="Sharded mode - the compression of the shards")
+    parser.add_argument('--shards_dir', default="Sharded Paradigms", help="Sharded mode - the output directory (with the shards' manifest)")
+    parser.add_argument('--format', choices=SINKS_FORMATS, help="Batch mode - write all the forms in this format into a single stream (--out) "
+                                                               "instead of a file per lemma ('null' only counts them)")
+    parser.add_argument('--out', help="Stream mode - the output file")
     args = parser.parse_args()
     file_path, verbose, use_unimorph_format = args.file_path, args.verbose, args.use_unimorph_format
+    workers = args.workers
+    if args.profile:
+        from profiling import enable_profiling
+        profiler = enable_profiling()
+        workers = 1 # the frames of worker processes aren't collected
+
+    lemmas_dicts = read_lemmas(file_path, use_cache=not args.no_cache)
+
+    if args.all or args.classes or args.lemmas or args.translations:
+        jobs = select_lemmas(lemmas_dicts, args.classes, args.lemmas and set(args.lemmas), args.translations and set(args.translations))
+        if args.format:
+            if args.format == 'null':
+                sink = stream_paradigms(jobs, 'null', None, workers=1) # the counts are of the sink of this process
+                print(f"Generated {sink.records} forms of {sink.lemmas} lemmas")
+            else:
+                if not args.out: parser.error("--format requires --out")
+                with open(args.out, 'w', encoding='utf8', buffering=1 << 20) as out:
+                    stream_paradigms(jobs, args.format, out, workers)
+                print(f"Generated {len(jobs)} paradigms into {args.out}")
+        elif args.shards:
+            from sharded_output import build_shards
+            manifest = build_shards(jobs, use_unimorph_format, verbose, args.shards_dir, args.shards, args.compression, workers)
+            print(f"Generated {len(jobs)} paradigms ({manifest['rows']} rows) into {len(manifest['shards'])} shards")
+        elif args.incremental:
+            from incremental_build import incremental_build
+            prune = not (args.classes or args.lemmas or args.translations) # only a build of the whole lexicon knows which lemmas were deleted
+            regenerated = incremental_build(jobs, use_unimorph_format, verbose, tables_dir=args.tables, dataset_path=args.dataset,
+                                            workers=workers, prune=prune)
+            print(f"Regenerated {len(regenerated)} of {len(jobs)} paradigms")
+        else:
+            paths = build_paradigms(jobs, use_unimorph_format, verbose, workers=workers)
+            print(f"Generated {len(paths)} paradigms")
+    else:
+        class_choice = 0  # can be either 0,1,2,3,4 ; write -1 for locking.
+        lemma_choices = [18, -1, -1, -1, -1] # when index isn't used, always insert 0 or -1 to disable the possibility of overriding
+        assert 0 <= class_choice < len(CONJUGATIONS_NAMES)
 
+        c = lemma_choices[class_choice]
+        build_paradigms([(class_choice, lemmas_dicts[class_choice][c])], use_unimorph_format, verbose, workers=1)
 
-    transitive_class = Conjugation(define_Transitive_Screeves())
-    TV_df = pd.read_excel(file_path, sheet_name=0)
-    TV_df = TV_df.drop(columns=TV_df.columns.tolist()[16:]) # Note the column add on the Excel!
-    TV_df.fillna('', inplace=True)
-
-    intransitive_class = Conjugation(define_Intransitive_Screeves())
-    ITV_df = pd.read_excel(file_path, sheet_name=1)
-    ITV_df = ITV_df.drop(columns=ITV_df.columns.tolist()[18:])
-    ITV_df.fillna('', inplace=True)
-
-    medial_class = Conjugation(define_Medial_Screeves())
-    MED_df = pd.read_excel(file_path, sheet_name=2)
-    MED_df = MED_df.drop(columns=MED_df.columns.tolist()[10:])
-    MED_df.fillna('', inplace=True)
-
-    indirect_class = Conjugation(define_Indirect_Screeves())
-    IND_df = pd.read_excel(file_path, sheet_name=3)
-    IND_df = IND_df.drop(columns=IND_df.columns.tolist()[15:])
-    IND_df.fillna('', inplace=True)
-
-    stative_class = Conjugation(define_Stative_Screeves())
-    STAT_df = pd.read_excel(file_path, sheet_name=4)
-    STAT_df = STAT_df.drop(columns=STAT_df.columns.tolist()[12:])
-    STAT_df.fillna('', inplace=True)
-
-
-    TV_lemmas_dict = {(idx+1):transitive_class.gen_lemma_object(row,'tv') for idx,row in TV_df.iterrows()}
-    ITV_lemmas_dict = {(idx+1):intransitive_class.gen_lemma_object(row,'itv') for idx,row in ITV_df.iterrows()}
-    MED_lemmas_dict = {(idx+1):medial_class.gen_lemma_object(row,'med') for idx,row in MED_df.iterrows()}
-    IND_lemmas_dict = {(idx+1):indirect_class.gen_lemma_object(row,'ind') for idx,row in IND_df.iterrows()}
-    STAT_lemmas_dict = {(idx+1):stative_class.gen_lemma_object(row,'stat') for idx,row in STAT_df.iterrows()}
-
-
-    conjugations_names = ['Transitive', 'Intransitive', 'Medial', 'Indirect', 'Stative']
-    if not os.path.isdir("Clean Paradigms"):
-        os.mkdir("Clean Paradigms")
-    for dir_name in conjugations_names:
-        if not os.path.isdir(os.path.join("Clean Paradigms", dir_name)):
-            os.mkdir(os.path.join("Clean Paradigms", dir_name))
-    choice_mapping = dict(zip(range(5),zip([transitive_class, intransitive_class, medial_class, indirect_class, stative_class],
-                                           [TV_lemmas_dict, ITV_lemmas_dict, MED_lemmas_dict, IND_lemmas_dict, STAT_lemmas_dict])))
-
-    class_choice = 0  # can be either 0,1,2,3,4 ; write -1 for locking.
-    lemma_choices = [18, -1, -1, -1, -1] # when index isn't used, always insert 0 or -1 to disable the possibility of overriding
-    assert 0 <= class_choice < len(conjugations_names)
-
-    # for i in range(31,47):
-    #     c = i # remove when serial generation is done
-    c = lemma_choices[class_choice]
-    example_lemma = choice_mapping[class_choice][1][c]
-    with open(os.path.join("Clean Paradigms", conjugations_names[class_choice], example_lemma.translation + ".txt"), 'w+', encoding='utf8') as f:
-        choice_mapping[class_choice][0].gen_paradigm(example_lemma, use_unimorph_format, verbose, f)
+    if FORMULATION_STATS['cells']: # counted in this process, and summed from the worker processes
+        print(f"Formulated {FORMULATION_STATS['formulated']} distinct forms for {FORMULATION_STATS['cells']} cells "
+              f"(dedup ratio {formulation_dedup_ratio():.1%})")
+    if args.profile:
+        profiler.dump(args.profile, args.profile_format)
@@ -1,7 +1,7 @@
 __author__ = "David Guriel"
-import copy
 from utils import *
-from prettytable import PrettyTable
+from profiling import profiled
+from sinks import Clean_Paradigm_Sink
 
 class Lemma:
     def __init__(self, idx:int, translation:str, preverb:str, version:str, root:str, ts:str, aor_indic_3rd_sg:str, alternative_root='', masdar_prf='', masdar_imprf='', lemma_form=''):
@@ -29,20 +29,32 @@ class Lemma:
             self.lemma_form = self.version['sg3']['sg3'] + self.root + self.passive_marker + self.ts + screeves[0].paas['sg3']['sg3']['suff']  # 1st Screeve, 3rd person singular
 
 
-    def generate_clean_paradigm(self, screeves, use_unimorph_format, verbose, file):
+    def iter_masdars(self):
+        for aspect, f in [('PRF', self.masdar_prf), ('IPFV', self.masdar_imprf)]:
+            if f != '': # not necessarily exist
+                yield FormRecord(self.lemma_form, f, None, None, 'MSDR', aspect)
+
+    def iter_forms(self, screeves):
+        """yields the FormRecords of the lemma's paradigm lazily, in the order of the Clean Paradigms files"""
         self.gen_lemma_form(screeves)
-        if verbose: file.write(f"#{self.idx} - {self.lemma_form} - {self.translation}:\n")
+        for screeve in screeves:
+            yield from screeve.iter_forms(self)
+        yield from self.iter_masdars()
 
-        for screeve in screeves: # print the 71 verbal forms (66 + 5 Imperative)
-            _ = screeve.generate_forms(copy.copy(self), use_unimorph_format, verbose, file)
+    def write_paradigm(self, screeves, sink):
+        """generates the lemma's paradigm into a sink (see sinks.py) - a batch per screeve, and one of the Masdars"""
+        self.gen_lemma_form(screeves)
+        sink.begin_lemma(self)
+        for screeve in screeves: # the 71 verbal forms (66 + 5 Imperative)
+            screeve.write_forms(self, sink) # the screeves don't modify the lemma
+        with profiled('phase:writing'):
+            sink.write_masdars(list(self.iter_masdars()))
+        sink.end_lemma()
 
-        # region print masdars
-        for s1,s2,f in [('PRF','Perfective',self.masdar_prf), ('IPFV','Imperfective',self.masdar_imprf)]:
-            if f != '':
-                if use_unimorph_format: file.write(f"{self.lemma_form}\t{f}\tV;V.MSDR;{s1}\n")
-                else: file.write(f"Masdar form, {s2}: ", f, '\n')
-        # endregion print masdars
-        # print('\n\n')
+    def generate_clean_paradigm(self, screeves, use_unimorph_format, verbose, file):
+        sink = Clean_Paradigm_Sink(file, use_unimorph_format, verbose)
+        self.write_paradigm(screeves, sink)
+        sink.flush()
 
 
 
@@ -131,7 +143,9 @@ class Indirect_Lemma(Lemma):
 class Stative_Lemma(Lemma):
     def __init__(self, idx: int, translation: str, valency:int, version: str, root_pres: str, ts_pres: str, root_fut:str, ts_fut:str, s3sg_pref, o3sg_suff, aor_indic_3rd_sg: str, exist_screeves:str):
         super().__init__(idx, translation, '', version, root_pres, ts_pres, aor_indic_3rd_sg)
-        # self.version = SUBJECTIVE_VERSION if version == 'subj' else zip_pronouns([version] * 6)
+        # The Stative forms agree with a single person (marked by the set B prefixes, as in Inversion), so the version varies
+        # only by that person - 'ი' for 1st & 2nd person, 'უ' for 3rd person in the Subjective Version
+        self.version = zip_pronouns(SUBJECTIVE_VERSION if version == 'subj' else [version] * 6)
         self.valency = valency
         self.exist_screeves = [int(c) for c in exist_screeves.split(',')] # can maximally be [1,4,7,8,9,10]
         # self.screeves2idx = dict(zip([1,4,7,8,9,10],range(1,7)))
@@ -144,10 +158,16 @@ class Stative_Lemma(Lemma):
         if self.lemma_form=='': # calculating the lemma name, if not already given
             self.lemma_form = self.s3sg_pref + self.version['sg3'] + self.root + self.passive_marker + self.ts + self.o3sg_suff  # 1st Screeve, 3rd person singular
 
-    def generate_clean_paradigm(self, screeves, use_unimorph_format, verbose, file):
+    def iter_forms(self, screeves):
         self.gen_lemma_form(screeves)
-        if verbose: file.write(f"#{self.idx} - {self.lemma_form} - {self.translation}:\n")
+        for screeve in screeves: # no Imperatives, no Masdars
+            if screeve.idx in self.exist_screeves:
+                yield from screeve.iter_forms(self)
 
-        for i,screeve in enumerate(screeves): # print the verbal forms (no Imperatives, no Masdars)
+    def write_paradigm(self, screeves, sink):
+        self.gen_lemma_form(screeves)
+        sink.begin_lemma(self)
+        for screeve in screeves: # the verbal forms (no Imperatives, no Masdars)
             if screeve.idx in self.exist_screeves:
-                screeve.generate_forms(copy.copy(self), use_unimorph_format, verbose, file)
+                screeve.write_forms(self, sink)
+        sink.end_lemma()
@@ -1,8 +1,35 @@
 __author__ = "David Guriel"
 from Lemma import *
 from utils import SCREEVES_NAMES
+from profiling import profiled
+from sinks import Clean_Paradigm_Sink
 import abc
-from prettytable import PrettyTable
+from collections import namedtuple
+
+# The per-call result of Screeve.screeve_specifications: the PAAs and markers of the screeve, and the stem elements of the
+# lemma, after the adjustments of the screeve to the lemma. A new plan is returned per call, and neither the Screeve nor the
+# Lemma are modified - so a single Screeve (and Conjugation) can serve many lemmas, also concurrently.
+ScreevePlan = namedtuple('ScreevePlan', ['paas', 'markers', 'preverb', 'version', 'root', 'passive_marker', 'ts'])
+
+# How many cells were generated, and how many distinct element combinations were actually formulated for them (per process).
+# Only the generation of the paradigms (Screeve.write_forms) is counted - not the lookups, splices or verifications of forms.
+FORMULATION_STATS = {'cells': 0, 'formulated': 0}
+
+def formulation_dedup_ratio():
+    """returns the share of the cells whose forms were reused from syncretic cells, instead of being formulated"""
+    return 1 - FORMULATION_STATS['formulated'] / FORMULATION_STATS['cells'] if FORMULATION_STATS['cells'] else 0.0
+
+def with_formulation_stats(func, *args):
+    """runs func, and returns its result with the FORMULATION_STATS it added - for jobs of worker processes, see merge_formulation_stats"""
+    before = dict(FORMULATION_STATS)
+    res = func(*args)
+    return res, {k: FORMULATION_STATS[k] - before[k] for k in FORMULATION_STATS}
+
+def merge_formulation_stats(results):
+    """yields the results of with_formulation_stats jobs that ran in other processes, adding their stats to this process's"""
+    for res, stats in results:
+        for k, v in stats.items(): FORMULATION_STATS[k] += v
+        yield res
 
 class Screeve:
     def __init__(self, idx:int, PAAs:[[[str]]], screeve_markers:[str], formula):
@@ -13,72 +40,98 @@ class Screeve:
         self.formulate = formula # concatenates the different elements required for the forms.
 
     @abc.abstractmethod
-    def screeve_specifications(self, lemma:Lemma):
+    def screeve_specifications(self, lemma:Lemma) -> ScreevePlan:
         pass
 
+    def formulate_cells(self, plan:ScreevePlan, stats=None):
+        """
+        yields the (p_obj, p_subj, form) of every cell of the screeve, for a plan returned by screeve_specifications.
+        The cells and the distinct forms formulated for them are added to stats (e.g. FORMULATION_STATS), if given.
+        """
+        formulate, preverb, root, passive_marker, ts = self.formulate, plan.preverb, plan.root, plan.passive_marker, plan.ts
+        # The PAAs are very syncretic - only the elements that vary between the cells are keyed, and every distinct
+        # combination of them is concatenated once.
+        formulated = {}
+        n_cells = 0
+        for p_obj, obj_paas in plan.paas.items():
+            obj_versions, obj_markers = plan.version[p_obj], plan.markers[p_obj]
+            for p_subj, paa in obj_paas.items():
+                key = (paa['pref'], obj_versions[p_subj], obj_markers[p_subj], paa['suff'])
+                form = formulated.get(key)
+                if form is None: # not all of the elements are actually used, depends on the Screeve.
+                    form = formulated[key] = formulate(key[0], preverb, key[1], root, passive_marker, ts, key[2], key[3])
+                n_cells += 1
+                yield p_obj, p_subj, form
+        if stats is not None:
+            stats['cells'] += n_cells
+            stats['formulated'] += len(formulated)
+
+    def formulate_cell(self, plan:ScreevePlan, p_obj, p_subj):
+        """returns the form of a single cell, for a plan returned by screeve_specifications (None if the screeve has no such cell)"""
+        paa = plan.paas.get(p_obj, {}).get(p_subj)
+        if paa is None: return None
+        return self.formulate(paa['pref'], plan.preverb, plan.version[p_obj][p_subj], plan.root, plan.passive_marker, plan.ts,
+                              plan.markers[p_obj][p_subj], paa['suff'])
+
+    def iter_forms(self, lemma:Lemma, plan:ScreevePlan=None):
+        """yields the FormRecords of the lemma in this screeve, followed by the Imperatives that are taken from its forms"""
+        if plan is None: plan = self.screeve_specifications(lemma) # implemented per each class
+        forms = {}
+        for p_obj, p_subj, form in self.formulate_cells(plan):
+            forms[p_obj, p_subj] = form
+            yield FormRecord(lemma.lemma_form, form, p_subj, p_obj, self.idx)
+        yield from self.iter_imperatives(lemma, forms)
+
+    def iter_imperatives(self, lemma:Lemma, forms):
+        """yields the Imperative FormRecords that are taken from this screeve's forms ({(p_obj, p_subj): form})"""
+        for p_obj in self.paas:
+            for p_subj in self.imperative_subjects(p_obj):
+                yield FormRecord(lemma.lemma_form, forms[p_obj, p_subj], p_subj, p_obj, 'IMP')
+
+    def write_forms(self, lemma:Lemma, sink):
+        """generates the lemma's forms in this screeve (with the Imperatives taken from them) into a sink, as a single batch"""
+        with profiled(f'screeve:{self.idx}'):
+            with profiled('phase:specifications'):
+                plan = self.screeve_specifications(lemma)
+            with profiled('phase:formulation'):
+                records = [FormRecord(lemma.lemma_form, form, p_subj, p_obj, self.idx) for p_obj, p_subj, form in self.formulate_cells(plan, FORMULATION_STATS)]
+            if self.idx in {7,8}:
+                with profiled('phase:imperatives'):
+                    records += self.iter_imperatives(lemma, {(record.object, record.subject): record.form for record in records})
+            with profiled('phase:writing'):
+                sink.write_screeve(self.idx, records)
+        return records
+
     def generate_forms(self, lemma:Lemma, print_by_format:bool, verbose:bool, file):
-        self.screeve_specifications(lemma) # implemented per each class
+        sink = Clean_Paradigm_Sink(file, print_by_format, verbose)
+        records = self.write_forms(lemma, sink)
+        sink.flush()
+        return [record.form for record in records if record.screeve != 'IMP'] if print_by_format else []
 
-        forms = []
-        forms_for_table = []
-        if verbose: file.write(f'Screeve #{self.idx}:\n')
-        for p_obj in self.paas:
-            for p_subj in self.paas[p_obj]:
-                form = self.formulate(self.paas[p_obj][p_subj]['pref'],
-                      lemma.preverb,
-                      lemma.version[p_obj][p_subj],
-                      lemma.root,
-                      lemma.passive_marker,
-                      lemma.ts,
-                      self.markers[p_obj][p_subj],
-                      self.paas[p_obj][p_subj]['suff']) # not all of them are actually used, depends on the Screeve.
-                eng_form = " = {}".format(transliterate_kat2eng(form)) if verbose else ''
-                if print_by_format:
-                    file.write(f"{lemma.lemma_form}\t{form}\tV;{format_pronouns(p_subj)};{format_pronouns(p_obj)};{screeves_formats[self.idx]}{eng_form}\n")
-                    forms_for_table.append(form)
-                else:
-                    file.write(f"{form}{eng_form}\n")
-                # print(form)
-                forms.append(form)
-        if self.idx in {7,8}:
-            lens=[0,4,8,14,18,22,28]
-            ordered_forms = []
-            for i in range(6):
-                ordered_forms.append(forms[lens[i]:lens[i+1]])
-            # current_forms_dict = zip_pronouns(forms)
-            current_forms_dict = zip_ext_pronouns_paas(ordered_forms, mode='prons')
-            self.gen_imperatives(current_forms_dict, lemma.lemma_form, print_by_format, verbose, file)
-        file.write('\n\n')
-        if self.idx in {7,8}: file.write('\n')
-        return forms_for_table
-
-
-    def gen_imperatives(self, current_forms_dict, lemma_form, print_by_format, verbose, file):
-        file.write('\n')
+
+    def imperative_subjects(self, p_obj):
+        """returns the subjects whose Imperative forms are taken from this screeve's forms, for the given object"""
         if self.idx == 7:  # generating Imperative forms for sg2 and pl2.
             iter_prons = ['sg2', 'pl2']
         elif self.idx == 8:  # generating Imperative forms for pl1, sg3, pl3.
             iter_prons = ['pl1', 'sg3', 'pl3']
         else:
-            raise Exception("Impossible case!")
-        for p_obj in self.paas:
-            actual_subjs = list(set(iter_prons) & set(self.paas[p_obj]))
-            for p_subj in actual_subjs:
-                form = current_forms_dict[p_obj][p_subj]
-                eng_form = " = {}".format(transliterate_kat2eng(form)) if verbose else ''
-                if print_by_format:
-                    file.write(f"{lemma_form}\t{form}\tV;{format_pronouns(p_subj)};{format_pronouns(p_obj)};IMP{eng_form}\n")
-                else:
-                    file.write(f"Imperative form, {p_subj},{p_obj}: {form}{eng_form}\n")
+            return []
+        return [p for p in iter_prons if p in self.paas[p_obj]] # keeps the order deterministic
 
+    def copy_paas(self):
+        """returns a copy of the screeve's PAAs, which can be adjusted to a lemma without modifying the screeve"""
+        return {p_obj: {p_subj: dict(paa) for p_subj, paa in d.items()} for p_obj, d in self.paas.items()}
 
-    def set_subject_affix(self, affix, pronoun, value):
-        for k in self.paas:
-            self.paas[k][pronoun][affix] = value
+    @staticmethod
+    def set_subject_affix(paas, affix, pronoun, value):
+        for k in paas:
+            paas[k][pronoun][affix] = value
 
-    def set_object_affix(self, affix, pronoun, value):
-        for k in self.paas[pronoun]:
-            self.paas[pronoun][k][affix] = value
+    @staticmethod
+    def set_object_affix(paas, affix, pronoun, value):
+        for k in paas[pronoun]:
+            paas[pronoun][k][affix] = value
 
 class Transitive_Screeve(Screeve):
     def __init__(self, idx:int, PAAs:[[str]], screeve_markers, formula):
@@ -86,81 +139,84 @@ class Transitive_Screeve(Screeve):
 
     def screeve_specifications(self, lemma:Transitive_Lemma):
         # region Screeves specifications
+        paas, markers = self.copy_paas(), self.markers
+        version, root, ts = lemma.version, lemma.root, lemma.ts
 
         # self.paas['pl3']['suff'] = 'ან' # instead of 'en'
-        if self.idx in {1,4} and lemma.ts=='ი':
-            for k in self.paas:
-                self.paas[k]['pl3']['suff'] = 'ან' # instead of 'en'
+        if self.idx in {1,4} and ts=='ი':
+            for k in paas:
+                paas[k]['pl3']['suff'] = 'ან' # instead of 'en'
 
         if self.idx == 9:
-            lemma.version = lemma.perfect_version
+            version = lemma.perfect_version
         elif self.idx in {10, 11}:
-            lemma.version = lemma.pluperfect_version
+            version = lemma.pluperfect_version
 
         if self.idx == 7:
             # self.paas['sg3']['suff'] = lemma.aor_indic_3rd_sg  # can be "a" or "o"
-            for k in self.paas:
-                suff = self.paas[k]['sg3']['suff']
+            for k in paas:
+                suff = paas[k]['sg3']['suff']
                 if len(suff)==1:
-                    self.paas[k]['sg3']['suff'] = lemma.aor_indic_3rd_sg # can be either "a" or "o"
+                    paas[k]['sg3']['suff'] = lemma.aor_indic_3rd_sg # can be either "a" or "o"
                 else: # len == 2
-                    self.paas[k]['sg3']['suff'] = suff.replace(suff[0],lemma.aor_indic_3rd_sg)
+                    paas[k]['sg3']['suff'] = suff.replace(suff[0],lemma.aor_indic_3rd_sg)
 
         if self.idx==10:
             # vowel = lemma.aor_indic_vowel
             # self.markers = zip_pronouns([vowel]*6)
 
-            for k in self.paas: # the index is transposed, bc of the Inversion...
-                assert self.paas['sg3'][k]['suff'] == self.paas['pl3'][k]['suff']
-                suff = self.paas['sg3'][k]['suff']
+            for k in paas: # the index is transposed, bc of the Inversion...
+                assert paas['sg3'][k]['suff'] == paas['pl3'][k]['suff']
+                suff = paas['sg3'][k]['suff']
                 if len(suff)==1:
                     res = lemma.aor_indic_3rd_sg
                 else: # len == 2
                     res = suff.replace(suff[0], lemma.aor_indic_3rd_sg) # can be either "a" or "o"
-                self.paas['sg3'][k]['suff'] = res
-                self.paas['pl3'][k]['suff'] = res
+                paas['sg3'][k]['suff'] = res
+                paas['pl3'][k]['suff'] = res
 
         if self.idx in {7,10}:
             vowel = lemma.aor_indic_vowel
             mode = 'subj' if self.idx==7 else 'obj'
-            self.markers = set_screeve_markers([vowel,vowel,'',vowel,vowel,''], mode=mode)
+            markers = set_screeve_markers([vowel,vowel,'',vowel,vowel,''], mode=mode)
         if self.idx==8:
-            self.markers = set_screeve_markers([lemma.aor_subjn_vowel]*6, mode='subj')
+            markers = set_screeve_markers([lemma.aor_subjn_vowel]*6, mode='subj')
         if self.idx==11:
-            self.markers = set_screeve_markers([lemma.third_subjn_vowel]*6, mode='subj')
+            markers = set_screeve_markers([lemma.third_subjn_vowel]*6, mode='subj')
 
-        if self.idx == 9 and (lemma.ts == 'ებ' and not vowel_in_word(lemma.root) or lemma.root == 'ხურ'):
-            lemma.ts = ''  # if a root has no vowel and ts==ებ, then in 9th screeve the ts is ommited!
+        if self.idx == 9 and (ts == 'ებ' and not vowel_in_word(root) or root == 'ხურ'):
+            ts = ''  # if a root has no vowel and ts==ებ, then in 9th screeve the ts is ommited!
 
         if self.idx in {7, 8, 10, 11}:
             if lemma.alter_root != '':
-                lemma.root = lemma.alter_root  # a simple case of root changing
-            if lemma.ts=='ენ':
+                root = lemma.alter_root  # a simple case of root changing
+            if ts=='ენ':
                 if self.idx in {7,8}:
-                    lemma.root += 'ინ'
+                    root += 'ინ'
                 else:
-                    lemma.ts = 'ინ'
-            elif lemma.ts == 'ევ':
+                    ts = 'ინ'
+            elif ts == 'ევ':
                 if self.idx in {7,8}:
-                    lemma.root += 'ი'
+                    root += 'ი'
                 else:
-                    lemma.ts = 'ი' # implies no TS at all - see the if statement below that cancels specific TSs
-                    lemma.root += 'ი'
+                    ts = 'ი' # implies no TS at all - see the if statement below that cancels specific TSs
+                    root += 'ი'
 
-        if lemma.ts=='ოფ':
-            if self.idx==9: lemma.ts = 'ვ'
-            elif self.idx in {10,11}: lemma.ts=''
+        if ts=='ოფ':
+            if self.idx==9: ts = 'ვ'
+            elif self.idx in {10,11}: ts=''
 
-        if self.idx in {9, 10, 11} and lemma.ts in {'ავ','ი','ობ','ამ'}:
-            lemma.ts = ''
+        if self.idx in {9, 10, 11} and ts in {'ავ','ი','ობ','ამ'}:
+            ts = ''
 
-        if self.idx in {10, 11} and lemma.ts == 'ებ':
-            if vowel_in_word(lemma.root):
-                lemma.ts = 'ებინ'
+        if self.idx in {10, 11} and ts == 'ებ':
+            if vowel_in_word(root):
+                ts = 'ებინ'
             else:
-                lemma.ts = ''
+                ts = ''
             # An unhandled case regarding lemma.ts=='ავ' - sometimes the 3rd Subjunctive screeve marker is ა and not ო! (irrelevant for "lose")
         # endregion Screeves specifications
+        return ScreevePlan(paas, markers, lemma.preverb, version, root, lemma.passive_marker, ts)
 
 def define_Transitive_Screeves(conj='tv'):
     if conj=='tv': conj_class = Transitive_Screeve
@@ -231,23 +287,25 @@ class Intransitive_Screeve(Screeve):
         super(Intransitive_Screeve, self).__init__(idx, PAAs, screeve_markers, formula)
 
     def screeve_specifications(self, lemma: Intransitive_Lemma):
+        paas, markers = self.copy_paas(), self.markers
+        root, ts = lemma.root, lemma.ts
 
         if self.idx == 7:
-            self.set_subject_affix('suff', 'sg3', lemma.aor_indic_3rd_sg) # can mostly be "a" or "o"
-            self.paas['pl2']['sg3']['suff'] += 'თ' # add the overriden 'თ'
+            self.set_subject_affix(paas, 'suff', 'sg3', lemma.aor_indic_3rd_sg) # can mostly be "a" or "o"
+            paas['pl2']['sg3']['suff'] += 'თ' # add the overriden 'თ'
             vowel = lemma.aor_indic_vowel
-            self.markers = set_screeve_markers([vowel, vowel, '', vowel, vowel, ''], mode='subj')
+            markers = set_screeve_markers([vowel, vowel, '', vowel, vowel, ''], mode='subj')
 
         if self.idx == 8:
             if lemma.formation_option in {2,3}:
                 vowel = 'ე'
                 markers = [vowel] * 5 + ['']
-                self.set_subject_affix('suff', 'pl3', 'ნენ')
+                self.set_subject_affix(paas, 'suff', 'pl3', 'ნენ')
             else:
                 vowel = 'ო'
                 markers = [vowel] * 6
-                self.set_subject_affix('suff', 'pl3', 'ნ')
-            self.markers = set_screeve_markers(markers, mode='subj')
+                self.set_subject_affix(paas, 'suff', 'pl3', 'ნ')
+            markers = set_screeve_markers(markers, mode='subj')
 
         if self.idx in {10,11}:
             if lemma.valency==1:
@@ -256,18 +314,19 @@ class Intransitive_Screeve(Screeve):
             else:
                 _, paas2, paas3, *_ = get_Intransitive_paas()
                 if self.idx==10:
-                    self.paas = zip_ext_pronouns_paas(paas2) # zip_pronouns_paas([['ვ', ''], ['', ''], ['', 'ა'], ['ვ', 'თ'], ['', 'თ'], ['', 'ნენ']])
+                    paas = zip_ext_pronouns_paas(paas2) # zip_pronouns_paas([['ვ', ''], ['', ''], ['', 'ა'], ['ვ', 'თ'], ['', 'თ'], ['', 'ნენ']])
                 else:
-                    self.paas = zip_ext_pronouns_paas(paas3) # zip_pronouns_paas([['ვ',''], ['',''], ['','ს'], ['ვ','თ'], ['','თ'], ['','ნენ']])
+                    paas = zip_ext_pronouns_paas(paas3) # zip_pronouns_paas([['ვ',''], ['',''], ['','ს'], ['ვ','თ'], ['','თ'], ['','ნენ']])
 
 
         if self.idx in {9, 10, 11}:
-            lemma.ts = lemma.perfect_ts if self.idx==9 else lemma.pluperfect_ts
+            ts = lemma.perfect_ts if self.idx==9 else lemma.pluperfect_ts
             if lemma.valency==1:
-                if lemma.perfect_marker in {'მარ', 'მალ'} : # special case of marker = m-___-ar (circumfix)
-                    lemma.root = 'მ' + lemma.root
-                    lemma.perfect_marker = lemma.perfect_marker[1:]
-                self.markers = set_screeve_markers([lemma.perfect_marker] * 6, mode='subj')
+                perfect_marker = lemma.perfect_marker
+                if perfect_marker in {'მარ', 'მალ'} : # special case of marker = m-___-ar (circumfix)
+                    root = 'მ' + root
+                    perfect_marker = perfect_marker[1:]
+                markers = set_screeve_markers([perfect_marker] * 6, mode='subj')
             else: # lemma.valency==2:
                 if self.idx==9:
                     marker_char = ''
@@ -276,13 +335,15 @@ class Intransitive_Screeve(Screeve):
                 #     markers = ['ი', 'ი', '', 'ი', 'ი', 'ი']
                 # elif self.idx==11:
                 #     markers = ['ე']*6
-                    self.markers = set_screeve_markers([marker_char+c for c in markers], mode='subj')
+                    markers = set_screeve_markers([marker_char+c for c in markers], mode='subj')
 
                 # self.set_subject_affix('pref', 'sg3', lemma.perfects_3rd_IDO)
                 per3 = ['sg3', 'pl3']
                 for i in per3:
                     for j in per3:
-                        self.paas[i][j]['pref'] = lemma.perfects_3rd_IDO
+                        paas[i][j]['pref'] = lemma.perfects_3rd_IDO
+
+        return ScreevePlan(paas, markers, lemma.preverb, lemma.version, root, lemma.passive_marker, ts)
 
 
 def define_Intransitive_Screeves():
@@ -352,45 +413,49 @@ class Medial_Screeve(Screeve):
 
     def screeve_specifications(self, lemma: Medial_Lemma):
         assert lemma.preverb==''
+        paas, markers = self.copy_paas(), self.markers
+        version, root, ts = lemma.version, lemma.root, lemma.ts
 
-        if lemma.ts=='ი' and self.idx in {1,2,3}:
+        if ts=='ი' and self.idx in {1,2,3}:
             if self.idx==1:
-                self.set_subject_affix('suff', 'pl3', 'ან')
+                self.set_subject_affix(paas, 'suff', 'pl3', 'ან')
             else:
-                self.markers = set_screeve_markers(['ოდ'+c for c in ['ი','ი','','ი','ი','']], mode='subj')
-                lemma.ts = ''
-        if self.idx==1 and lemma.ts=='ი':
+                markers = set_screeve_markers(['ოდ'+c for c in ['ი','ი','','ი','ი','']], mode='subj')
+                ts = ''
+        if self.idx==1 and ts=='ი':
             # self.paas['pl3']['suff'] = 'ან' # instead of 'en'
-            self.set_subject_affix('suff','pl3','ან')
+            self.set_subject_affix(paas, 'suff','pl3','ან')
 
         # if self.idx in {2,3}:
         #     self.markers = set_screeve_markers()
 
         if self.idx in {4,5,6,7,8}:
-            lemma.ts = lemma.future_ts
-            lemma.version = set_screeve_markers(['ი']*6, mode='subj')
+            ts = lemma.future_ts
+            version = set_screeve_markers(['ი']*6, mode='subj')
 
         if self.idx in {9,10,11}:
-            if lemma.ts not in {'ენ','ინავ'}:
-                lemma.ts = ''
+            if ts not in {'ენ','ინავ'}:
+                ts = ''
 
         if self.idx == 9:
-            lemma.version = lemma.perfect_version
+            version = lemma.perfect_version
         elif self.idx in {10, 11}:
-            lemma.version = lemma.pluperfect_version
+            version = lemma.pluperfect_version
 
         if self.idx == 7:
-            self.set_subject_affix('suff','sg3','ა')
+            self.set_subject_affix(paas, 'suff','sg3','ა')
             # self.paas['sg3']['suff'] = 'ა' # instead of lemma.aor_indic_3rd_sg - can be "a" except the verb "feel".
 
         if self.idx in {7, 8, 10, 11}:
             if lemma.alter_root != '':
-                lemma.root = lemma.alter_root  # a simple case of root changing
-            if lemma.ts in {'ენ','ინავ'}:
+                root = lemma.alter_root  # a simple case of root changing
+            if ts in {'ენ','ინავ'}:
                 if self.idx in {7,8}:
-                    lemma.root += 'ინ'
+                    root += 'ინ'
                 else:
-                    lemma.ts = 'ინ'
+                    ts = 'ინ'
+
+        return ScreevePlan(paas, markers, lemma.preverb, version, root, lemma.passive_marker, ts)
 
 def define_Medial_Screeves(): return define_Transitive_Screeves('med')
 
@@ -400,8 +465,11 @@ class Indirect_Screeve(Screeve):
         super().__init__(idx, PAAs, screeve_markers, formula)
 
     def screeve_specifications(self, lemma: Indirect_Lemma):
+        paas, markers = self.copy_paas(), self.markers
+        version, root, ts = lemma.version, lemma.root, lemma.ts
+
         if self.idx==1:
-            for i,k in enumerate(self.paas):
+            for i,k in enumerate(paas):
                 if i < 4: # [1sg, 2sg, 3sg, 1pl]
                     if lemma.pres_IDO_3sg_suffix == 'ს': curr_3sg_suff = 'ს'
                     elif lemma.pres_IDO_3sg_suffix == 'ა': curr_3sg_suff = 'ა'
@@ -411,8 +479,8 @@ class Indirect_Screeve(Screeve):
                     elif lemma.pres_IDO_3sg_suffix == 'ა': curr_3sg_suff = 'ათ'
                     else: raise Exception("Invalid 3sg suffix marker")
                     # otherwise do nothing
-                self.paas['sg3'][k]['suff'] = curr_3sg_suff
-                self.paas['pl3'][k]['suff'] = curr_3sg_suff
+                paas['sg3'][k]['suff'] = curr_3sg_suff
+                paas['pl3'][k]['suff'] = curr_3sg_suff
 
                 # self.set_object_affix('suff','3sg',)
 
@@ -421,41 +489,41 @@ class Indirect_Screeve(Screeve):
             # self.paas['pl3']['pref'] = lemma.pres_S_3sg_pref
             # self.set_subject_affix('pref','sg3',lemma.pres_S_3sg_pref) # too restrictive! see the following alternative
             # self.set_subject_affix('pref','pl3',lemma.pres_S_3sg_pref)
-            for k in self.paas:
+            for k in paas:
                 if not k in {'sg1','pl1'}: # because there are forms like 'v-q'av-d-i !
-                    self.paas[k]['sg3']['pref'] = lemma.pres_S_3sg_pref
-                    self.paas[k]['pl3']['pref'] = lemma.pres_S_3sg_pref
+                    paas[k]['sg3']['pref'] = lemma.pres_S_3sg_pref
+                    paas[k]['pl3']['pref'] = lemma.pres_S_3sg_pref
             # lemma.root = lemma.root
             # lemma.ts = lemma.ts
 
         elif self.idx in {4,5,6}:
-            lemma.version = set_screeve_markers(['ე']*6, mode='subj')
-            lemma.root = lemma.root_fut
-            lemma.ts = lemma.ts_fut
+            version = set_screeve_markers(['ე']*6, mode='subj')
+            root = lemma.root_fut
+            ts = lemma.ts_fut
         elif self.idx in {9,10,11}:
             # self.paas['sg3']['pref'] = lemma.pres_S_3sg_pref
             # self.paas['pl3']['pref'] = lemma.pres_S_3sg_pref
 
             # self.set_subject_affix('pref','sg3',lemma.pres_S_3sg_pref)
             # self.set_subject_affix('pref','pl3',lemma.pres_S_3sg_pref)
-            for k in self.paas:
+            for k in paas:
                 if not k in {'sg1','pl1'}: # because there are forms like 'v-q'av-d-i !
-                    self.paas[k]['sg3']['pref'] = lemma.pres_S_3sg_pref
-                    self.paas[k]['pl3']['pref'] = lemma.pres_S_3sg_pref
+                    paas[k]['sg3']['pref'] = lemma.pres_S_3sg_pref
+                    paas[k]['pl3']['pref'] = lemma.pres_S_3sg_pref
 
 
-            lemma.version = set_screeve_markers([''] * 6, mode='subj')
-            lemma.root = lemma.root_perf
-            lemma.ts = lemma.ts_perf
+            version = set_screeve_markers([''] * 6, mode='subj')
+            root = lemma.root_perf
+            ts = lemma.ts_perf
         else:
             raise Exception("No more screeves exist! If 7,8 do exist, add them manually!")
 
         if self.idx in {2,3,5,6,10,11}: # <=> not in 1,4,9
             d_marker = lemma.screeve_marker_d if self.idx in {2,3} else 'ოდ'
             # self.markers = set_screeve_markers([d_marker + v for k, v in self.markers['sg3'].items()], mode='subj')
-            for i in self.markers:
-                for j in self.markers[i]:
-                    self.markers[i][j] = d_marker + self.markers[i][j]
+            markers = {i: {j: d_marker + m for j, m in self.markers[i].items()} for i in self.markers}
+
+        return ScreevePlan(paas, markers, lemma.preverb, version, root, lemma.passive_marker, ts)
 
 
 def define_Indirect_Screeves():
@@ -511,63 +579,75 @@ def define_Indirect_Screeves():
 
 
 class Stative_Screeve(Screeve):
+    """
+    The Stative forms agree with a single person - the logical subject, which is marked by the set B prefixes (as in
+    Inversion) - so the PAAs, markers and versions are keyed by that person under a single None object.
+    """
     def __init__(self, idx: int, PAAs: [[str]], screeve_markers: [str], formula):
         super().__init__(idx, PAAs, screeve_markers, formula)
+        self.paas = {None: zip_pronouns_paas(PAAs)}
+        self.markers = zip_pronouns(screeve_markers)
 
-    def gen_imperatives(self, current_forms_dict, lemma_form, print_by_format, verbose, file):
-        pass # No Imperatives exist in this class!!!
+    def imperative_subjects(self, p_obj):
+        return [] # No Imperatives exist in this class!!!
 
     def screeve_specifications(self, lemma: Stative_Lemma):
         # Note: in this class, because 5 screeves do not exist, the screeves' indices are different!
         # for p in ['sg1', 'sg2', 'pl1', 'pl2']:
         #     del self.paas[p]
+        paas, markers = self.copy_paas()[None], self.markers
+        version, root, ts = lemma.version, lemma.root, lemma.ts
 
-        if self.idx!=1:
-            lemma.o3sg_suff = 'ა'
-        for i, k in enumerate(self.paas):
+        o3sg_suff = lemma.o3sg_suff if self.idx==1 else 'ა'
+        for i, k in enumerate(paas):
             # if k=='sg3':
             if i < 4:  # [1sg, 2sg, 3sg, 1pl]
-                if lemma.o3sg_suff == 'ს':
+                if o3sg_suff == 'ს':
                     curr_3sg_suff = 'ს'
-                elif lemma.o3sg_suff == 'ა':
+                elif o3sg_suff == 'ა':
                     curr_3sg_suff = 'ა'
                 else:
                     raise Exception("Invalid 3sg suffix marker")
             else:  # 'pl3'   # [2pl, 3pl]
-                if lemma.o3sg_suff == 'ს':
+                if o3sg_suff == 'ს':
                     curr_3sg_suff = 'თ'
-                elif lemma.o3sg_suff == 'ა':
+                elif o3sg_suff == 'ა':
                     curr_3sg_suff = 'ათ'
                 else:
                     raise Exception("Invalid 3sg suffix marker")
                 # otherwise do nothing
-            self.paas[k]['suff'] = curr_3sg_suff
+            paas[k]['suff'] = curr_3sg_suff
+
+        if self.idx==1: # the 3rd person prefix (ჰ, ს) of the lemma form
+            paas['sg3']['pref'] = paas['pl3']['pref'] = lemma.s3sg_pref
 
         if self.idx in {4,7,8}:
-            lemma.version = zip_pronouns(['ე']*6)
-            lemma.root = lemma.root_fut
-            lemma.ts = lemma.ts_fut
+            version = zip_pronouns(['ე']*6)
+            root = lemma.root_fut
+            ts = lemma.ts_fut
 
-        if self.idx in {7,8}:
-            self.paas['sg3']['suff'] = lemma.aor_indic_3rd_sg + ('ს' if self.idx==8 else '') # can mostly be "a" or "o"
-            self.paas['pl3']['suff'] = lemma.aor_indic_3rd_sg + 'თ'  # can mostly be "a" or "o"
+        if self.idx in {7,8}: # the same endings for all the persons - [1sg, 2sg, 3sg, 1pl] and [2pl, 3pl], as above
+            for i, k in enumerate(paas):
+                paas[k]['suff'] = lemma.aor_indic_3rd_sg + (('ს' if self.idx==8 else '') if i < 4 else 'თ') # can mostly be "a" or "o"
 
         if self.idx in {9,10}:
-            lemma.root = lemma.root_fut
-            lemma.ts = lemma.ts_fut
-            lemma.version = zip_pronouns(['']*6)
+            root = lemma.root_fut
+            ts = lemma.ts_fut
+            version = zip_pronouns(['']*6)
 
         if self.idx==9: # Originally Screeve 9
             if lemma.valency==1: marker = 'ულ'
             elif lemma.valency==2: marker = 'ი'
             else: raise Exception("Invalid valency!")
-            self.markers = zip_pronouns([marker]*6)
+            markers = zip_pronouns([marker]*6)
         elif self.idx==10: # Originally Screeve 10
             if lemma.valency==1:
                 marker = 'ულიყო'
             elif lemma.valency==2: marker = 'ოდ'
             else: raise Exception("Invalid valency!")
-            self.markers = zip_pronouns([marker]*6)
+            markers = zip_pronouns([marker]*6)
+
+        return ScreevePlan({None: paas}, {None: markers}, lemma.preverb, {None: version}, root, lemma.passive_marker, ts)
 
 
 def define_Stative_Screeves():
@@ -0,0 +1,151 @@
+__author__ = "David Guriel"
+import os
+import abc
+import sys
+import pickle
+from utils import read_dataset_lines
+from cells import pack_cell, record_cell, cell_tags
+
+
+class Analyzer:
+    @abc.abstractmethod
+    def analyze(self, form:str) -> [(str, str)]:
+        """returns all the (lemma, tags) analyses of the form, or an empty list if it is unknown"""
+        pass
+
+
+class Table_Analyzer(Analyzer):
+    """
+    Analyzes forms by a hash index (form -> analyses) of an enumerated dataset, i.e. the complete dataset or the tables in
+    'Final Tables By Classes'. Syncretic forms have several analyses, kept in the order of the dataset.
+    """
+    def __init__(self):
+        self.index = {}
+
+    def add(self, lemma, form, tags):
+        analysis = (sys.intern(lemma), sys.intern(tags)) # the lemmas and tags repeat a lot - keep a single copy of each
+        analyses = self.index.setdefault(form, [])
+        if analysis not in analyses:
+            analyses.append(analysis)
+
+    def analyze(self, form):
+        return list(self.index.get(form, ()))
+
+    def __contains__(self, form):
+        return form in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_dataset(cls, *file_paths):
+        """builds the index from files in the format of katVerbsCompleteDataset.txt"""
+        analyzer = cls()
+        for file_path in file_paths:
+            for lemma, form, tags in read_dataset_lines(file_path):
+                analyzer.add(lemma, form, tags)
+        return analyzer
+
+    @classmethod
+    def from_tables(cls, dir_path="Final Tables By Classes"):
+        """builds the index from all the tables of a directory (e.g. 'Final Tables By Classes'), in the order of their names"""
+        return cls.from_dataset(*[os.path.join(dir_path, name) for name in sorted(os.listdir(dir_path)) if name.endswith('.txt')])
+
+    def save(self, file_path):
+        """persists the index, so that it can be loaded later without parsing the dataset again"""
+        with open(file_path, 'wb') as f:
+            pickle.dump(self.index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_path):
+        # Note: the index is a pickle - load only files that were saved by Table_Analyzer.save
+        analyzer = cls()
+        with open(file_path, 'rb') as f:
+            analyzer.index = pickle.load(f)
+        return analyzer
+
+
+class Rules_Analyzer(Analyzer):
+    """
+    Analyzes forms by the generation rules, without enumerating the paradigms. The screeve specifications of every lemma are
+    applied once, when it is added, and the cells of every plan are indexed by their affixes: the elements that the formula
+    concatenates before the root (PAA prefix, preverb, version) and after it (passive marker, TS, screeve marker, PAA suffix).
+    These indices are shared by the plans with the same affixes (e.g. lemmas with the same preverb and TS), and the memory
+    is proportional to the number of lemmas.
+    A form is analyzed by finding the stems (the roots as the screeves adjust them) that occur in it, and looking up the
+    affixes around every occurrence - i.e. stripping them - so nothing is formulated.
+    The analyses have the tags of katVerbsCompleteDataset.txt, so they are interchangeable with Table_Analyzer's.
+    """
+    ROOT_PLACEHOLDER = chr(0xE000) # Unicode Private Use Area - never in a real form
+
+    def __init__(self):
+        self.stems = {} # stem -> list of (lemma, affixes index)
+        self.max_stem_len = 0
+        self.affixes_indices = {} # (screeve, the affixes of every cell) -> affixes index: {(before, after): [tags]}
+        self.masdars = {} # masdar -> list of (lemma_form, tags)
+
+    def add_lemmas(self, screeves, lemmas):
+        """indexes lemmas of a single class, whose screeves are given (e.g. define_Transitive_Screeves())"""
+        for lemma in lemmas:
+            lemma.gen_lemma_form(screeves)
+            for screeve in self._lemma_screeves(screeves, lemma):
+                plan = screeve.screeve_specifications(lemma)
+                if plan.root == '': continue
+                index = self._affixes_index(screeve, plan)
+                self.stems.setdefault(plan.root, []).append((lemma, index))
+                self.max_stem_len = max(self.max_stem_len, len(plan.root))
+            for record in lemma.iter_masdars():
+                self.masdars.setdefault(record.form, []).append((lemma.lemma_form, cell_tags(record_cell(record))))
+
+    def _affixes_index(self, screeve, plan):
+        # the affixes of every cell, split around the root - formulated once per plan, with a placeholder as the root
+        stem_plan = plan._replace(root=self.ROOT_PLACEHOLDER)
+        cells = [(p_obj, p_subj) for p_obj in plan.paas for p_subj in plan.paas[p_obj]]
+        affixes = tuple(tuple(screeve.formulate_cell(stem_plan, p_obj, p_subj).split(self.ROOT_PLACEHOLDER)) for p_obj, p_subj in cells)
+        key = (screeve, affixes)
+        if key not in self.affixes_indices:
+            index = {}
+            for (p_obj, p_subj), cell_affixes in zip(cells, affixes):
+                if len(cell_affixes) != 2: continue # the formula doesn't use the root
+                tags = index.setdefault(cell_affixes, [])
+                tags.append(cell_tags(pack_cell(screeve.idx, p_subj, p_obj)))
+                if p_subj in screeve.imperative_subjects(p_obj):
+                    tags.append(cell_tags(pack_cell('IMP', p_subj, p_obj)))
+            self.affixes_indices[key] = index
+        return self.affixes_indices[key]
+
+    @staticmethod
+    def _lemma_screeves(screeves, lemma):
+        return [screeve for screeve in screeves if not hasattr(lemma, 'exist_screeves') or screeve.idx in lemma.exist_screeves]
+
+    def analyze(self, form):
+        analyses = []
+        for i in range(len(form)):
+            for j in range(i+1, min(len(form), i+self.max_stem_len)+1):
+                entries = self.stems.get(form[i:j])
+                if entries is None: continue
+                affixes = (form[:i], form[j:])
+                for lemma, index in entries:
+                    for tags in index.get(affixes, ()):
+                        if (lemma.lemma_form, tags) not in analyses: analyses.append((lemma.lemma_form, tags))
+        analyses.extend(self.masdars.get(form, ()))
+        return analyses
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Prints the analyses of forms (given as arguments, or one per line in stdin)")
+    parser.add_argument('forms', nargs='*')
+    parser.add_argument("--dataset", default="katVerbsCompleteDataset.txt", help="The dataset file (or directory of tables) to index")
+    parser.add_argument("--index", help="A persisted index to load instead of the dataset")
+    parser.add_argument("--save", help="Where to persist the index")
+    args = parser.parse_args()
+
+    if args.index: analyzer = Table_Analyzer.load(args.index)
+    elif os.path.isdir(args.dataset): analyzer = Table_Analyzer.from_tables(args.dataset)
+    else: analyzer = Table_Analyzer.from_dataset(args.dataset)
+    if args.save: analyzer.save(args.save)
+
+    for form in args.forms or (line.strip() for line in sys.stdin):
+        for lemma, tags in analyzer.analyze(form):
+            print(f"{form}\t{lemma}\t{tags}")
@@ -0,0 +1,99 @@
+__author__ = "David Guriel"
+from collections import namedtuple
+from itertools import chain
+import numpy as np
+
+# The elements that a Screeve's formula concatenates, in the order of its arguments (see Screeve.generate_forms)
+FORMULA_SLOTS = ('pref', 'preverb', 'version', 'root', 'passive_marker', 'ts', 'marker', 'suff')
+CELL_SLOTS = ('pref', 'version', 'marker', 'suff') # vary per (object, subject) cell; the rest vary only per lemma
+
+# The forms of N lemmas in one screeve: forms[i, j] is the form of lemmas[i] in cells[j] = (p_obj, p_subj)
+ScreeveBatch = namedtuple('ScreeveBatch', ['idx', 'cells', 'forms'])
+
+
+def formula_slots(formula):
+    """
+    Finds the order in which a Screeve's formula concatenates its arguments, by calling it once with placeholder characters.
+    :return: a list of indices into FORMULA_SLOTS
+    """
+    placeholders = [chr(0xE000 + i) for i in range(len(FORMULA_SLOTS))] # Unicode Private Use Area - never in a real form
+    res = formula(*placeholders)
+    if any(c not in placeholders for c in res):
+        raise Exception("The formula isn't a plain concatenation of its arguments - it can't be used in batch generation!")
+    return [placeholders.index(c) for c in res]
+
+
+def _affixes(paas):
+    # all the affixes of the PAAs, in order - flattened without a Python loop per cell
+    return tuple(chain.from_iterable(map(dict.values, chain.from_iterable(map(dict.values, paas.values())))))
+
+
+def _cells_rows(plan, cells):
+    # the values of the cell-level slots of a single lemma, in the order of cells
+    paas, markers, version = plan.paas, plan.markers, plan.version
+    return {'pref': tuple(paas[o][s]['pref'] for o, s in cells),
+            'version': tuple(version[o][s] for o, s in cells),
+            'marker': tuple(markers[o][s] for o, s in cells),
+            'suff': tuple(paas[o][s]['suff'] for o, s in cells)}
+
+
+def gen_forms_batch(screeve, lemmas):
+    """
+    Generates the forms of many lemmas (of the class of the screeve) in a single screeve. The forms are identical to the ones
+    Screeve.generate_forms produces per lemma.
+    Per lemma only the screeve specifications are applied. The rows of PAAs, markers and versions are built once per distinct
+    (paas, markers, version) of the plans, so lemmas with identical ones (the common case) share them, and the forms of all
+    the cells are concatenated at once as NumPy arrays.
+    :return: a ScreeveBatch. Lemmas that don't have the screeve (see Stative_Lemma.exist_screeves) get empty forms.
+    """
+    plans = [None if hasattr(lemma, 'exist_screeves') and screeve.idx not in lemma.exist_screeves
+             else screeve.screeve_specifications(lemma) for lemma in lemmas]
+    # the cells are taken from the plans, since some screeves set their PAAs only in the specifications (e.g. Intransitive 10,11)
+    paas = next((plan.paas for plan in plans if plan is not None), screeve.paas)
+    cells = [(p_obj, p_subj) for p_obj in paas for p_subj in paas[p_obj]]
+    n_lemmas, n_cells = len(lemmas), len(cells)
+    if n_lemmas == 0:
+        return ScreeveBatch(screeve.idx, cells, np.empty((0, n_cells), dtype=str))
+
+    distinct_rows = {slot: {} for slot in CELL_SLOTS} # per slot: row -> index of the row
+    def rows_indices(rows): return [distinct_rows[slot].setdefault(rows[slot], len(distinct_rows[slot])) for slot in CELL_SLOTS]
+    # The rows are built once per distinct plan tables. The markers and versions are shared objects (see
+    # utils.set_screeve_markers), so they are keyed by identity (the plans are alive, so the ids are unique); the PAAs are
+    # adjusted copies, so they are keyed by their affixes.
+    plans_rows = {}
+    rows_idx = np.zeros((len(CELL_SLOTS), n_lemmas), dtype=np.intp)
+    lemma_values = {slot: [''] * n_lemmas for slot in set(FORMULA_SLOTS) - set(CELL_SLOTS)}
+    for i, plan in enumerate(plans):
+        if plan is None:
+            key = None
+        else:
+            for slot in lemma_values:
+                lemma_values[slot][i] = getattr(plan, slot)
+            key = (_affixes(plan.paas), id(plan.markers), id(plan.version))
+        indices = plans_rows.get(key)
+        if indices is None:
+            rows = {slot: ('',) * n_cells for slot in CELL_SLOTS} if plan is None else _cells_rows(plan, cells)
+            indices = plans_rows[key] = rows_indices(rows)
+        rows_idx[:, i] = indices
+
+    slot_arrays = {}
+    for k, slot in enumerate(CELL_SLOTS):
+        table = np.array(list(distinct_rows[slot]), dtype=str).reshape(-1, n_cells)
+        slot_arrays[slot] = table[rows_idx[k]] # (n_lemmas, n_cells)
+    for slot, values in lemma_values.items():
+        slot_arrays[slot] = np.array(values, dtype=str).reshape(n_lemmas, 1) # broadcast over the cells
+
+    forms = np.full((n_lemmas, n_cells), '', dtype=str)
+    for slot_idx in formula_slots(screeve.formulate):
+        forms = np.char.add(forms, slot_arrays[FORMULA_SLOTS[slot_idx]])
+    return ScreeveBatch(screeve.idx, cells, forms)
+
+
+def gen_paradigms_batch(screeves, lemmas):
+    """
+    Generates the forms of many lemmas of the same class, in all the screeves (the Imperatives and the Masdars are not included).
+    :return: the lemma forms (a list), and a list of ScreeveBatch - one per screeve.
+    """
+    for lemma in lemmas:
+        lemma.gen_lemma_form(screeves)
+    return [lemma.lemma_form for lemma in lemmas], [gen_forms_batch(screeve, lemmas) for screeve in screeves]
@@ -0,0 +1,36 @@
+__author__ = "David Guriel"
+import sys
+import statistics
+import subprocess
+
+# The modules that the generation / lookup code must be importable without
+HEAVY_MODULES = ['pandas', 'numpy', 'prettytable', 'openpyxl']
+CORE_MODULES = ['utils', 'Lemma', 'Screeve', 'CleanParadigms_main', 'analysis', 'mapped_dataset', 'incremental_build']
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+print(','.join(m for m in {heavy} if m in sys.modules))
+"""
+
+def time_import(module, repeats):
+    """imports the module in fresh interpreters; returns the median import time (ms) and the heavy modules it loaded"""
+    times, loaded = [], ''
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True).stdout.split('\n')
+        times.append(float(out[0]))
+        loaded = out[1]
+    return statistics.median(times), loaded
+
+if __name__=='__main__':
+    # Note: run `python -m compileall -q .` first - otherwise (e.g. with PYTHONDONTWRITEBYTECODE) every import compiles the sources.
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = False
+    for module in CORE_MODULES:
+        ms, loaded = time_import(module, repeats)
+        print(f"{module:<22}{ms:8.1f} ms" + (f"   loads {loaded}!" if loaded else ''))
+        failed |= bool(loaded)
+    if failed: raise Exception("Core modules import heavy dependencies!")
@@ -0,0 +1,48 @@
+__author__ = "David Guriel"
+import sys
+import time
+from utils import kat2eng, eng2kat, transliterate_kat2eng, transliterate_eng2kat, transliterate_many, read_dataset_lines
+
+# The original per-character implementations, kept as the reference of the compiled ones in utils.
+def reference_kat2eng(kat_word): return ''.join([kat2eng[c] for c in list(kat_word)])
+def reference_eng2kat(eng_word):
+    kat_chars_list = list()
+    for i in range(len(eng_word)):
+        if eng_word[i]=="'":
+            continue
+        elif eng_word[i] not in eng2kat: # e.g. "q'"
+            kat_char = eng2kat[eng_word[i]+"'"]
+        else:
+            if i+1<len(eng_word):
+                if eng_word[i+1]=="'":
+                    kat_char = eng2kat[eng_word[i]+"'"]
+                else:
+                    kat_char = eng2kat[eng_word[i]]
+            else:
+                kat_char = eng2kat[eng_word[i]]
+        kat_chars_list.append(kat_char)
+    return ''.join(kat_chars_list)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - start
+
+if __name__=='__main__':
+    # Transliterates all the forms of the dataset both ways, checks that the results are identical to the reference ones,
+    # and prints the timings.
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "katVerbsCompleteDataset.txt"
+    forms = [form for _, form, _ in read_dataset_lines(file_path)]
+
+    ref_eng, t_ref_eng = timed(lambda: [reference_kat2eng(w) for w in forms])
+    eng, t_eng = timed(lambda: [transliterate_kat2eng(w) for w in forms])
+    bulk_eng, t_bulk_eng = timed(transliterate_many, forms, 'kat2eng')
+    ref_kat, t_ref_kat = timed(lambda: [reference_eng2kat(w) for w in ref_eng])
+    kat, t_kat = timed(lambda: [transliterate_eng2kat(w) for w in ref_eng])
+    bulk_kat, t_bulk_kat = timed(transliterate_many, ref_eng, 'eng2kat')
+
+    if not ref_eng == eng == bulk_eng: raise Exception("kat2eng differs from the reference!")
+    if not ref_kat == kat == bulk_kat: raise Exception("eng2kat differs from the reference!")
+    print(f"{len(forms)} forms, identical to the reference")
+    print(f"kat2eng: reference {t_ref_eng:.3f}s, per word {t_eng:.3f}s ({t_ref_eng/t_eng:.1f}x), bulk {t_bulk_eng:.3f}s ({t_ref_eng/t_bulk_eng:.1f}x)")
+    print(f"eng2kat: reference {t_ref_kat:.3f}s, per word {t_kat:.3f}s ({t_ref_kat/t_kat:.1f}x), bulk {t_bulk_kat:.3f}s ({t_ref_kat/t_bulk_kat:.1f}x)")
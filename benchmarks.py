@@ -0,0 +1,209 @@
+__author__ = "David Guriel"
+import os
+import io
+import gc
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from CleanParadigms_main import *
+from utils import get_Transitive_paas, get_Intransitive_paas, get_Indirect_paas, transliterate_many, read_dataset_lines
+from analysis import Table_Analyzer
+from mapped_dataset import Mapped_Dataset
+from remove_transliteration import iter_input_files, stripped_text
+
+BASELINE_PATH = "benchmarks_baseline.json"
+DATASET_PATH = "katVerbsCompleteDataset.txt"
+
+# Lemma rows in the format of the Excel sheets, used only to time the generation (the workbook isn't bundled). Their forms
+# aren't necessarily correct Georgian.
+BENCH_ROWS = {
+    'tv': [(1, 'write', 'და', '', 'წერ', '', 'ა', 'ე', 'ო', 'OV', 'IOV', 'ო', '', '', '', ''),
+           (5, 'do', 'გა', 'ა', 'კეთ', 'ებ', 'ა', 'ე', 'ო', 'OV', 'IOV', 'ო', '', '', '', ''),
+           (4, 'lose', 'და', '', 'კარგ', 'ავ', 'ა', 'ე', 'ო', 'OV', 'IOV', 'ო', '', '', '', ''),
+           (17, 'cut', 'გა', '', 'ჭრ', 'ი', 'ა', 'ი', 'ა', 'OV', 'IOV', 'ა', '', '', '', '')],
+    'itv': [(23, 'help', 3, 2, 'და', 'ე', 'ხმარ', 'ებ', 'ა', 'ე', 'ებ', 'ებ', '', 'ს', '', '', '', ''),
+            (10, 'hide_tv', 1, 2, 'და', 'ე', 'მალ', 'ებ', 'ა', 'ე', 'ებ', 'ებ', '', 'ჰ', '', '', '', '')],
+    'med': [(13, 'play', '', 'თამაშ', 'ობ', 'ობ', '', '', '', ''),
+            (48, 'sing', '', 'მღერ', 'ი', 'ებ', '', '', '', '')],
+    'ind': [(5, 'love', 'შე', 'უ', 'ყვარ', '', '', 'ს', 'ყვარ', '', 'ყვარ', '', '', 'დ', 'სიყვარული'),
+            (6, 'like', 'მო', '', 'წონ', '', 'ს', 'ს', 'წონ', '', 'წონ', '', '', 'დ', '')],
+    'stat': [(5, 'called', 2, '', 'ქვ', 'ი', 'რქმ', 'ევ', 'ჰ', 'ა', 'ა', '1,4,7,8,9,10'),
+             (7, 'held', 2, 'subj', 'კავ', 'ი', 'კავ', 'ებ', '', 'ა', 'ა', '1,4,7,8,9,10')],
+}
+
+
+def reference_workload():
+    """a fixed pure-Python workload (string concatenation, dicts & lists) which doesn't use the code of the repository"""
+    table = {}
+    for i in range(20000):
+        table[str(i % 997)] = table.get(str(i % 997), '')[:8] + chr(0x10D0 + i % 33)
+    return len(sorted(table.values()))
+
+
+def run_benchmark(func, repeats):
+    """
+    Runs func (which returns the number of items it processed) `repeats` times, and once more under tracemalloc. Every run
+    is preceded by a run of reference_workload, so the speed is also measured relative to the speed of the machine (at that time).
+    :return: a dictionary of the best time (the least disturbed by other processes), the items per second, the items per
+    the time of the reference workload ('relative_speed' - comparable across machines) and the peak memory (KiB) of a run
+    """
+    times, reference_times = [], []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        reference_workload()
+        reference_times.append(time.perf_counter() - start)
+        gc.collect()
+        start = time.perf_counter()
+        items = func()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    seconds = min(times)
+    return {'seconds': seconds, 'items': items, 'items_per_sec': items / seconds if seconds else 0,
+            'relative_speed': items * min(reference_times) / seconds if seconds else 0, 'peak_kib': peak / 1024}
+
+
+def bench_lemmas(conj):
+    return [Conjugation.gen_lemma_object(row, conj) for row in BENCH_ROWS[conj]]
+
+
+def define_benchmarks(scale):
+    """returns the (name, function) pairs of the suite - each function returns the number of items (forms, rows...) it processed"""
+    benchmarks = []
+    for conj in CONJUGATIONS_CODES:
+        class_choice = CONJUGATIONS_CODES.index(conj)
+        def define_screeves(class_choice=class_choice): # the PAA tables (zip_ext_pronouns_paas) and markers (set_screeve_markers) of all the screeves
+            for _ in range(scale): SCREEVES_DEFINITIONS[class_choice]()
+            return scale
+        benchmarks.append((f"define_screeves[{CONJUGATIONS_NAMES[class_choice]}]", define_screeves))
+
+        def generate_forms(class_choice=class_choice, conj=conj):
+            screeves, lemmas, n = SCREEVES_DEFINITIONS[class_choice](), bench_lemmas(conj), 0
+            for _ in range(scale):
+                for lemma in lemmas:
+                    lemma.gen_lemma_form(screeves)
+                    for screeve in screeves:
+                        f = io.StringIO()
+                        screeve.generate_forms(lemma, True, False, f)
+                        n += f.getvalue().count('\tV;')
+            return n
+        benchmarks.append((f"generate_forms[{CONJUGATIONS_NAMES[class_choice]}]", generate_forms))
+
+    for get_paas in [get_Transitive_paas, get_Intransitive_paas, get_Indirect_paas]: # the zip_ext_pronouns_paas tables alone
+        def paas_tables(get_paas=get_paas):
+            for _ in range(scale): get_paas()
+            return scale
+        benchmarks.append((f"{get_paas.__name__}", paas_tables))
+
+    def generate_clean_paradigm(): # end to end, verbose and in the Unimorph format
+        n = 0
+        for conj in CONJUGATIONS_CODES:
+            conjugation = get_conjugation(CONJUGATIONS_CODES.index(conj))
+            for _ in range(scale):
+                for lemma in bench_lemmas(conj):
+                    f = io.StringIO()
+                    conjugation.gen_paradigm(lemma, True, True, f)
+                    n += f.getvalue().count('\tV;')
+        return n
+    benchmarks.append(("generate_clean_paradigm", generate_clean_paradigm))
+
+    for sink_format in ['null', 'tsv', 'jsonl']: # the generation alone, and with the formatting of the other sinks
+        def write_paradigm(sink_format=sink_format):
+            f = io.StringIO()
+            with make_sink(sink_format, f) as sink:
+                for conj in CONJUGATIONS_CODES:
+                    conjugation = get_conjugation(CONJUGATIONS_CODES.index(conj))
+                    for _ in range(scale):
+                        for lemma in bench_lemmas(conj):
+                            conjugation.write_paradigm(lemma, sink)
+            return sink.records if sink_format == 'null' else f.getvalue().count('\n')
+        benchmarks.append((f"write_paradigm[{sink_format}]", write_paradigm))
+
+    forms = [form for _, form, _ in read_dataset_lines(DATASET_PATH)]
+    eng_forms = transliterate_many(forms, 'kat2eng')
+    benchmarks.append(("transliterate[kat2eng]", lambda: len(transliterate_many(forms, 'kat2eng'))))
+    benchmarks.append(("transliterate[eng2kat]", lambda: len(transliterate_many(eng_forms, 'eng2kat'))))
+
+    benchmarks.append(("load_dataset", lambda: sum(1 for _ in read_dataset_lines(DATASET_PATH))))
+    analyzer = Table_Analyzer.from_dataset(DATASET_PATH)
+    benchmarks.append(("index_dataset", lambda: len(Table_Analyzer.from_dataset(DATASET_PATH))))
+    benchmarks.append(("analyze_forms", lambda: sum(1 for form in forms if analyzer.analyze(form))))
+
+    def mapped_paradigms():
+        with Mapped_Dataset(DATASET_PATH, index_path=os.path.join(tempfile.gettempdir(), "bench.offsets.json")) as dataset:
+            return sum(len(dataset.paradigm(lemma)) for lemma in dataset.lemmas())
+    benchmarks.append(("mapped_paradigms", mapped_paradigms))
+
+    def clean_paradigms_io(): # reading the bundled Clean Paradigms files and removing their transliterations
+        return sum(stripped_text(path).count('\n') for path, _ in iter_input_files(["Clean Paradigms"]))
+    benchmarks.append(("clean_paradigms_io", clean_paradigms_io))
+
+    try: # Excel ingestion is optional - it requires pandas & openpyxl
+        import pandas as pd
+        import openpyxl
+    except ImportError:
+        print("Skipping the Excel ingestion benchmarks (pandas / openpyxl aren't installed)")
+        return benchmarks
+    workbook_path = os.path.join(tempfile.mkdtemp(), "bench_lemmas.xlsx")
+    with pd.ExcelWriter(workbook_path) as writer:
+        for i, conj in enumerate(CONJUGATIONS_CODES):
+            rows = [(j+1,) + tuple(row[1:]) for j, row in enumerate(BENCH_ROWS[conj] * 5 * scale)]
+            pd.DataFrame(rows, columns=SHEETS_SCHEMAS[i]).to_excel(writer, sheet_name=conj, index=False)
+    benchmarks.append(("excel_parse", lambda: sum(len(rows) for rows in parse_lexicon(workbook_path))))
+    read_lexicon(workbook_path) # writes the cache
+    benchmarks.append(("excel_cached", lambda: sum(len(rows) for rows in read_lexicon(workbook_path))))
+    return benchmarks
+
+
+def compare(results, baseline, tolerance):
+    """
+    prints the change of every benchmark relative to the baseline; returns the names of the regressed ones.
+    The speeds are compared relative to the reference workload, so the baseline may have been recorded on another machine.
+    """
+    regressions = []
+    for name, res in results.items():
+        if name not in baseline: continue
+        speed = res['relative_speed'] / baseline[name]['relative_speed'] if baseline[name]['relative_speed'] else 1
+        memory = res['peak_kib'] / baseline[name]['peak_kib'] if baseline[name]['peak_kib'] else 1
+        regressed = speed < 1 - tolerance or memory > 1 + tolerance
+        print(f"{name:<36}speed x{speed:5.2f}  memory x{memory:5.2f}" + ("   REGRESSION" if regressed else ''))
+        if regressed: regressions.append(name)
+    return regressions
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Runs the benchmarks of the generation, lookup and I/O, and compares them to a baseline")
+    parser.add_argument('-r', '--repeats', type=int, default=5)
+    parser.add_argument('-s', '--scale', type=int, default=5, help="How many times to repeat the work of each run")
+    parser.add_argument('-k', '--only', nargs='+', help="Run only the benchmarks whose names contain one of these")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save_baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Relative slowdown / memory growth reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in define_benchmarks(args.scale):
+        if args.only and not any(k in name for k in args.only): continue
+        results[name] = run_benchmark(func, args.repeats)
+        res = results[name]
+        print(f"{name:<36}{res['seconds']*1000:10.2f} ms {res['items_per_sec']:14,.0f} items/s {res['peak_kib']:10,.0f} KiB peak")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf8') as f:
+            json.dump({'python': sys.version.split()[0], 'scale': args.scale, 'results': results}, f, indent=1, sort_keys=True)
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, 'r', encoding='utf8') as f:
+            baseline = json.load(f)
+        if baseline['scale'] != args.scale: raise Exception("The baseline was recorded with another --scale!")
+        if any('relative_speed' not in res for res in baseline['results'].values()):
+            raise Exception("The baseline has no relative speeds - record it again with --save_baseline")
+        print()
+        if compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,93 @@
+__author__ = "David Guriel"
+from utils import screeves_formats, format_pronouns, format_pronouns_schema2, FormRecord
+
+# A compact encoding of the paradigm cells: (screeve, subject, object) - or the Masdar's aspect - packed into one small integer
+# in mixed radix: code = (slot * 6 + subject) * 7 + object, where the slot is the screeve (0-10 for screeves 1-11, 11 for the
+# Imperative), the subject is 0-5 and the object is 0 (none - e.g. in the intransitive rows of the dataset) or 1-6, in the
+# order of PRONOUNS. The 2 Masdars follow. The codes are dense, so a paradigm can be stored as a fixed-length list of N_CELLS
+# forms indexed by the code, and a set of cells as a bit mask.
+
+PRONOUNS = ['sg1', 'sg2', 'sg3', 'pl1', 'pl2', 'pl3']
+SCREEVE_SLOTS = list(range(1, 12)) + ['IMP']
+MASDARS_ASPECTS = ['PRF', 'IPFV']
+N_VERBAL_CELLS = len(SCREEVE_SLOTS) * len(PRONOUNS) * (len(PRONOUNS)+1)
+N_CELLS = N_VERBAL_CELLS + len(MASDARS_ASPECTS)
+
+# The UniMorph dimension of every TAM feature (aspect, mood, tense), in the canonical order of the dimensions
+UNIMORPH_DIMENSIONS = {'IPFV': 0, 'PFV': 0, 'PRF': 0, 'IND': 1, 'SBJV': 1, 'COND': 1, 'OPT': 1, 'IMP': 1, 'PRS': 2, 'PST': 2, 'FUT': 2}
+
+_PRONOUNS_CODES = {p: i for i, p in enumerate(PRONOUNS)}
+_SLOTS_CODES = {s: i for i, s in enumerate(SCREEVE_SLOTS)}
+
+
+def pack_cell(screeve, subject=None, obj=None, aspect=None):
+    """:param screeve: the screeve's index (1-11), 'IMP' or 'MSDR' (then the aspect, 'PRF' / 'IPFV', is given instead of pronouns)"""
+    if screeve == 'MSDR':
+        return N_VERBAL_CELLS + MASDARS_ASPECTS.index(aspect)
+    return (_SLOTS_CODES[screeve] * len(PRONOUNS) + _PRONOUNS_CODES[subject]) * (len(PRONOUNS)+1) + (0 if obj is None else _PRONOUNS_CODES[obj]+1)
+
+
+def unpack_cell(code):
+    """returns the (screeve, subject, object, aspect) of a code - the inverse of pack_cell"""
+    if code >= N_VERBAL_CELLS:
+        return 'MSDR', None, None, MASDARS_ASPECTS[code - N_VERBAL_CELLS]
+    rest, obj = divmod(code, len(PRONOUNS)+1)
+    slot, subject = divmod(rest, len(PRONOUNS))
+    return SCREEVE_SLOTS[slot], PRONOUNS[subject], (None if obj == 0 else PRONOUNS[obj-1]), None
+
+
+def record_cell(record:FormRecord): return pack_cell(record.screeve, record.subject, record.object, record.aspect)
+
+
+def _cell_tags(code, schema):
+    screeve, subject, obj, aspect = unpack_cell(code)
+    if screeve == 'MSDR': return f"V;V.MSDR;{aspect}"
+    tam = ['IMP'] if screeve == 'IMP' else screeves_formats[screeve].split(';')
+    if schema == 'unimorph': # the features in UniMorph's canonical order - V;PFV;IND;PST;s1;sSG;o3;oSG
+        return ';'.join(['V'] + sorted(tam, key=UNIMORPH_DIMENSIONS.get) + format_pronouns_schema2(subject, 's').split(';') +
+                        (format_pronouns_schema2(obj, 'o').split(';') if obj is not None else []))
+    if schema == 'schema2':
+        pronouns = [format_pronouns_schema2(subject, 's')] + ([format_pronouns_schema2(obj, 'o')] if obj is not None else [])
+    else:
+        pronouns = [format_pronouns(subject)] + ([format_pronouns(obj)] if obj is not None else [])
+    return ';'.join(['V'] + pronouns + tam)
+
+# code -> tags, in the schema of the Clean Paradigms files (V;2;SG;1;SG;IND;PRS), of the dataset (V;s2;sSG;o1;oSG;IND;PRS)
+# and of the dataset in UniMorph's canonical order (V;IND;PRS;s2;sSG;o1;oSG)
+CELLS_TAGS = {schema: [_cell_tags(code, schema) for code in range(N_CELLS)] for schema in ['clean', 'schema2', 'unimorph']}
+_TAGS_CODES = {tags: code for schema_tags in CELLS_TAGS.values() for code, tags in enumerate(schema_tags)}
+
+
+def cell_tags(code, schema='schema2'): return CELLS_TAGS[schema][code]
+
+def tags_cell(tags):
+    """returns the code of tags in any of the schemas"""
+    if tags not in _TAGS_CODES: raise Exception(f"Unknown tags: {tags}")
+    return _TAGS_CODES[tags]
+
+
+def paradigm_array(records):
+    """returns the forms of a paradigm's FormRecords (e.g. of Lemma.iter_forms) as a list of N_CELLS, indexed by the codes (None - no form)"""
+    array = [None] * N_CELLS
+    for record in records:
+        array[record_cell(record)] = record.form
+    return array
+
+
+def dataset_arrays(rows):
+    """returns {lemma: paradigm array} of (lemma, form, tags) rows in either schema, e.g. read_dataset_lines('katVerbsCompleteDataset.txt')"""
+    arrays = {}
+    for lemma, form, tags in rows:
+        arrays.setdefault(lemma, [None] * N_CELLS)[tags_cell(tags)] = form
+    return arrays
+
+
+def cells_mask(array):
+    """returns the cells of a paradigm array that have forms, as a bit mask (so that sets of cells are intersected with &, etc.)"""
+    mask = 0
+    for code, form in enumerate(array):
+        if form is not None: mask |= 1 << code
+    return mask
+
+
+def mask_cells(mask): return [code for code in range(N_CELLS) if mask >> code & 1]
@@ -0,0 +1,77 @@
+__author__ = "David Guriel"
+import os
+import sys
+from cells import CELLS_TAGS
+from remove_transliteration import iter_input_files
+
+# Converts the tags of data files between the schemas of cells.CELLS_TAGS: 'clean' (the Clean Paradigms files,
+# V;2;SG;1;SG;IND;PRS), 'schema2' (katVerbsCompleteDataset.txt and the *.schema2.txt tables, V;s2;sSG;o1;oSG;IND;PRS) and
+# 'unimorph' (schema2's features in UniMorph's canonical order, V;IND;PRS;s2;sSG;o1;oSG). Every line is converted by a
+# single lookup of its tags, whatever their schema, and the files are streamed - so any amount of data takes constant memory.
+# Lines without tags (the verbose headers, or the lines of files that weren't written in the UniMorph format) are kept.
+
+BUFFER_SIZE = 1 << 20
+
+
+def conversion_table(to_schema):
+    """returns {tags in any of the schemas: the same tags in to_schema}"""
+    target = CELLS_TAGS[to_schema]
+    return {tags: target[code] for schema_tags in CELLS_TAGS.values() for code, tags in enumerate(schema_tags)}
+
+
+def convert_lines(lines, table, source='<stdin>'):
+    """yields the lines (of lemma, form, tags) with their tags converted by a table of conversion_table"""
+    for line_num, line in enumerate(lines, start=1):
+        rest, tab, tags = line.rstrip('\n').rpartition('\t')
+        if not tab:
+            yield line
+            continue
+        tags, eq, eng_form = tags.partition(' = ') # the transliteration of the verbose files
+        converted = table.get(tags)
+        if converted is None:
+            raise Exception(f"{source}:{line_num}: Unknown tags: {tags}")
+        yield f"{rest}\t{converted}{eq}{eng_form}\n"
+
+
+def convert_file(in_path, out_path, table):
+    with open(in_path, 'r', encoding='utf8', buffering=BUFFER_SIZE) as f:
+        with open(out_path, 'w', encoding='utf8', buffering=BUFFER_SIZE) as fout:
+            fout.writelines(convert_lines(f, table, in_path))
+
+
+def convert_paths(paths, to_schema, out_dir=None, stream=None):
+    """
+    Converts the .txt files of paths (files, or directories that are walked recursively).
+    :param out_dir: write the outputs into this directory, mirroring the input trees
+    :param stream: write all the outputs, in order, into this single stream (e.g. sys.stdout) instead
+    """
+    table = conversion_table(to_schema)
+    for path, rel_path in iter_input_files(paths, skip_raw=False): # the stripped *_raw.txt files have tags too
+        if stream is not None:
+            with open(path, 'r', encoding='utf8', buffering=BUFFER_SIZE) as f:
+                stream.writelines(convert_lines(f, table, path))
+            continue
+        out_path = os.path.join(out_dir, rel_path)
+        if os.path.abspath(out_path) == os.path.abspath(path):
+            raise Exception(f"Can't convert {path} into itself!")
+        os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+        convert_file(path, out_path, table)
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Converts the tags of data files between the schemas. Reads stdin and writes "
+                                                 "stdout when no paths are given.")
+    parser.add_argument('paths', nargs='*', help="Data files (.txt) or directories of them (e.g. 'Final Tables By Classes')")
+    parser.add_argument('--to', required=True, choices=list(CELLS_TAGS), help="The schema to convert to (the input tags may be in any schema)")
+    parser.add_argument('-o', '--out-dir', help="Write the outputs into this directory, mirroring the inputs (default: all to stdout)")
+    args = parser.parse_args()
+
+    sys.stdout.reconfigure(encoding='utf8')
+    if not args.paths:
+        sys.stdin.reconfigure(encoding='utf8')
+        sys.stdout.writelines(convert_lines(sys.stdin, conversion_table(args.to)))
+    elif args.out_dir:
+        convert_paths(args.paths, args.to, out_dir=args.out_dir)
+    else:
+        convert_paths(args.paths, args.to, stream=sys.stdout)
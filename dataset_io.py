@@ -0,0 +1,100 @@
+__author__ = "David Guriel"
+import numpy as np
+from utils import read_dataset_lines, write_dataset_lines
+
+TAGS_SEPARATOR = ';'
+
+
+def _encode_strings(strings):
+    # all the strings as one UTF-8 buffer, and the offsets of each string in it (the i-th is blob[offsets[i]:offsets[i+1]])
+    encoded = [s.encode('utf8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_strings(blob, offsets):
+    buffer = blob.tobytes()
+    return [buffer[offsets[i]:offsets[i+1]].decode('utf8') for i in range(len(offsets) - 1)]
+
+
+def export_npz(rows, out_path):
+    """
+    Writes (lemma, form, tags) rows in a dictionary-encoded columnar format - a NumPy .npz file:
+    - the distinct lemmas (as a UTF-8 buffer + offsets), and a lemma id per row
+    - the forms of the rows (as a UTF-8 buffer + offsets)
+    - the distinct tag components (e.g. 'V', 's1', 'sSG', 'IND'), and per row the codes of its components (0 is padding)
+    :param rows: (lemma, form, tags) triplets, e.g. read_dataset_lines('katVerbsCompleteDataset.txt')
+    """
+    lemmas_vocab, components_vocab = {}, {} # the components' codes start at 1 - 0 is only padding, even for an empty component
+    lemma_ids, forms, tags_codes = [], [], []
+    for lemma, form, tags in rows:
+        lemma_ids.append(lemmas_vocab.setdefault(lemma, len(lemmas_vocab)))
+        forms.append(form)
+        tags_codes.append([components_vocab.setdefault(c, len(components_vocab)+1) for c in tags.split(TAGS_SEPARATOR)])
+    if len(components_vocab) >= np.iinfo(np.uint8).max:
+        raise Exception("Too many distinct tag components for uint8 codes!")
+
+    max_components = max((len(codes) for codes in tags_codes), default=0)
+    tags_array = np.zeros((len(tags_codes), max_components), dtype=np.uint8)
+    for i, codes in enumerate(tags_codes):
+        tags_array[i, :len(codes)] = codes
+    lemmas_blob, lemmas_offsets = _encode_strings(lemmas_vocab)
+    forms_blob, forms_offsets = _encode_strings(forms)
+    components_blob, components_offsets = _encode_strings([''] + list(components_vocab)) # a placeholder for the padding code
+    np.savez(out_path, lemmas_blob=lemmas_blob, lemmas_offsets=lemmas_offsets, lemma_ids=np.array(lemma_ids, dtype=np.uint32),
+             forms_blob=forms_blob, forms_offsets=forms_offsets,
+             components_blob=components_blob, components_offsets=components_offsets, tags=tags_array)
+
+
+class Columnar_Dataset:
+    """
+    A dataset loaded from a file written by export_npz. Loading only reads the arrays - the strings are decoded on access.
+    """
+    def __init__(self, file_path):
+        with np.load(file_path, allow_pickle=False) as npz:
+            self.lemmas = _decode_strings(npz['lemmas_blob'], npz['lemmas_offsets']) # distinct lemmas - few
+            self.components = _decode_strings(npz['components_blob'], npz['components_offsets'])
+            self.lemma_ids = npz['lemma_ids']
+            self.forms_buffer = npz['forms_blob'].tobytes()
+            self.forms_offsets = npz['forms_offsets']
+            self.tags_codes = npz['tags']
+
+    def __len__(self):
+        return len(self.lemma_ids)
+
+    def lemma(self, i):
+        return self.lemmas[self.lemma_ids[i]]
+
+    def form(self, i):
+        return self.forms_buffer[self.forms_offsets[i]:self.forms_offsets[i+1]].decode('utf8')
+
+    def tags(self, i):
+        return TAGS_SEPARATOR.join(self.components[c] for c in self.tags_codes[i] if c != 0)
+
+    def rows(self):
+        """yields the (lemma, form, tags) triplets, in the original order"""
+        tags_cache = {} # the tags repeat a lot - decode every distinct row of codes once
+        for i in range(len(self)):
+            codes = self.tags_codes[i].tobytes()
+            if codes not in tags_cache:
+                tags_cache[codes] = self.tags(i)
+            yield self.lemma(i), self.form(i), tags_cache[codes]
+
+    def rows_of_lemma(self, lemma):
+        """returns the indices of the rows of a lemma"""
+        return np.flatnonzero(self.lemma_ids == self.lemmas.index(lemma))
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Converts datasets between the text format (as katVerbsCompleteDataset.txt) and the columnar .npz format")
+    parser.add_argument('mode', choices=['export', 'import'], help="export: text -> .npz, import: .npz -> text")
+    parser.add_argument('in_path')
+    parser.add_argument('out_path')
+    args = parser.parse_args()
+
+    if args.mode == 'export':
+        export_npz(read_dataset_lines(args.in_path), args.out_path)
+    else:
+        write_dataset_lines(Columnar_Dataset(args.in_path).rows(), args.out_path)
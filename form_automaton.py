@@ -0,0 +1,222 @@
+__author__ = "David Guriel"
+import os
+import sys
+import mmap
+import array
+import struct
+import bisect
+
+# A minimal acyclic automaton (DAWG) of all the forms, for spell-checking. The forms share long prefixes (the preverbs and
+# PAA prefixes - მ/გ/ვ/გვ) and suffixes (the PAA suffixes and screeve markers), and in the minimal automaton both are stored
+# once. The automaton is serialized as flat arrays, which are used in place through a memory map:
+#   header:      magic, n_states, n_transitions, n_words, the alphabet's length in bytes (little-endian uint32s)
+#   alphabet:    the characters of the labels, in utf8 (padded to 4 bytes)
+#   offsets:     uint32[n_states+1] - the transitions of state s are [offsets[s], offsets[s+1]), sorted by label
+#   targets:     uint32[n_transitions]
+#   labels:      uint16[n_transitions] - indices into the alphabet, which is sorted, so the forms are iterated in order
+#   finals:      uint8[n_states] - whether a form ends in the state
+# The root is state 0.
+
+MAGIC = b'KATDAWG1'
+HEADER = struct.Struct('<8sIIII')
+
+
+class _State:
+    __slots__ = ['final', 'edges']
+
+    def __init__(self):
+        self.final, self.edges = False, {}
+
+    def key(self):
+        # the children are already minimized (i.e. canonical), so they are compared by identity
+        return self.final, tuple((ch, id(child)) for ch, child in sorted(self.edges.items()))
+
+
+def build_automaton(words):
+    """
+    Builds the minimal automaton of the words incrementally (Daciuk et al., 2000) - the words are sorted and deduplicated first,
+    and every state is minimized once its last word has been added. Returns (root, n_words).
+    """
+    root, register, unchecked = _State(), {}, [] # unchecked: the (parent, char, child) path of the previous word
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, ch, child = unchecked.pop()
+            key = child.key()
+            if key in register: parent.edges[ch] = register[key]
+            else: register[key] = child
+
+    previous, n_words = '', 0
+    for word in sorted(set(words)):
+        common = 0
+        while common < min(len(word), len(previous)) and word[common] == previous[common]: common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else root
+        for ch in word[common:]:
+            child = _State()
+            node.edges[ch] = child
+            unchecked.append((node, ch, child))
+            node = child
+        node.final = True
+        previous, n_words = word, n_words + 1
+    minimize(0)
+    return root, n_words
+
+
+def serialize_automaton(root, n_words):
+    """returns the bytes of the automaton (see the format above)"""
+    states, ids = [root], {id(root): 0} # numbered in BFS order
+    for state in states:
+        for child in state.edges.values():
+            if id(child) not in ids:
+                ids[id(child)] = len(states)
+                states.append(child)
+    alphabet = sorted({ch for state in states for ch in state.edges})
+    labels_ids = {ch: i for i, ch in enumerate(alphabet)}
+
+    offsets, targets, labels, finals = array.array('I', [0]), array.array('I'), array.array('H'), array.array('B')
+    for state in states:
+        for ch, child in sorted(state.edges.items()):
+            labels.append(labels_ids[ch])
+            targets.append(ids[id(child)])
+        offsets.append(len(targets))
+        finals.append(state.final)
+    if sys.byteorder != 'little':
+        for a in (offsets, targets, labels): a.byteswap()
+
+    alphabet_bytes = ''.join(alphabet).encode('utf8')
+    alphabet_bytes += b'\0' * (-len(alphabet_bytes) % 4)
+    return b''.join([HEADER.pack(MAGIC, len(states), len(targets), n_words, len(alphabet_bytes)), alphabet_bytes,
+                     offsets.tobytes(), targets.tobytes(), labels.tobytes(), finals.tobytes()])
+
+
+def compile_automaton(words, out_path):
+    """builds the minimal automaton of the words and writes it to out_path; returns (n_words, n_states, size in bytes)"""
+    data = serialize_automaton(*build_automaton(words))
+    with open(out_path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(out_path + '.tmp', out_path)
+    _, n_states, _, n_words, _ = HEADER.unpack_from(data)
+    return n_words, n_states, len(data)
+
+
+def dataset_forms(*file_paths):
+    """yields the forms of files in the format of katVerbsCompleteDataset.txt"""
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3: yield parts[1]
+
+
+def generated_forms(jobs):
+    """yields the forms of the (class_choice, lemma) pairs, from the generator"""
+    from CleanParadigms_main import get_conjugation
+    for class_choice, lemma in jobs:
+        for record in get_conjugation(class_choice).iter_forms(lemma):
+            yield record.form
+
+
+class Form_Automaton:
+    """
+    The forms of a compiled automaton, through a memory map of its file - nothing is decoded up front, so loading is
+    immediate, and processes that map the same file share its pages.
+    """
+    def __init__(self, file_path="forms.dawg"):
+        self.file = open(file_path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_states, n_transitions, self.n_words, alphabet_len = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            self.close()
+            raise Exception(f"{file_path} isn't a compiled forms automaton!")
+        pos = HEADER.size
+        self.alphabet = self.buffer[pos:pos+alphabet_len].decode('utf8').rstrip('\0')
+        self.labels_ids = {ch: i for i, ch in enumerate(self.alphabet)}
+        pos += alphabet_len
+        self.offsets = self._array(pos, 'I', n_states+1)
+        pos += 4 * (n_states+1)
+        self.targets = self._array(pos, 'I', n_transitions)
+        pos += 4 * n_transitions
+        self.labels = self._array(pos, 'H', n_transitions)
+        pos += 2 * n_transitions
+        self.finals = self._array(pos, 'B', n_states)
+
+    def _array(self, pos, typecode, n):
+        size = array.array(typecode).itemsize * n
+        if sys.byteorder == 'little':
+            return memoryview(self.buffer)[pos:pos+size].cast(typecode)
+        a = array.array(typecode, self.buffer[pos:pos+size]) # a copy, on big-endian machines
+        a.byteswap()
+        return a
+
+    def close(self):
+        for a in (self.offsets, self.targets, self.labels, self.finals):
+            if isinstance(a, memoryview): a.release()
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_words
+
+    def _walk(self, prefix):
+        # returns the state that prefix leads to, or None
+        state, offsets, labels = 0, self.offsets, self.labels
+        for ch in prefix:
+            label = self.labels_ids.get(ch)
+            if label is None: return None
+            lo, hi = offsets[state], offsets[state+1]
+            i = bisect.bisect_left(labels, label, lo, hi)
+            if i == hi or labels[i] != label: return None
+            state = self.targets[i]
+        return state
+
+    def is_valid_form(self, word):
+        state = self._walk(word)
+        return state is not None and self.finals[state] == 1
+
+    __contains__ = is_valid_form
+
+    def iter_forms_with_prefix(self, prefix=''):
+        """yields the forms that start with prefix, in sorted order"""
+        state = self._walk(prefix)
+        if state is None: return
+        offsets, targets, labels, alphabet = self.offsets, self.targets, self.labels, self.alphabet
+        stack = [(state, prefix)]
+        while stack:
+            state, word = stack.pop()
+            if self.finals[state]: yield word
+            for i in range(offsets[state+1]-1, offsets[state]-1, -1): # pushed in reverse, so that they're popped in order
+                stack.append((targets[i], word + alphabet[labels[i]]))
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Compiles the forms into a minimal automaton, and checks words against it")
+    parser.add_argument('words', nargs='*', help="Words to check (prints whether each is a valid form)")
+    parser.add_argument('-a', '--automaton', default="forms.dawg", help="The compiled automaton")
+    parser.add_argument('--build', action='store_true', help="Compile the automaton first - from --dataset, or from the lemmas of --file_path")
+    parser.add_argument('--dataset', nargs='+', default=["katVerbsCompleteDataset.txt"], help="Data files to take the forms from")
+    parser.add_argument('--file_path', help="Take the forms from the generator, of all the lemmas of this Excel file")
+    parser.add_argument('-p', '--prefix', help="Print all the forms that start with this prefix")
+    args = parser.parse_args()
+
+    sys.stdout.reconfigure(encoding='utf8')
+    if args.build:
+        if args.file_path:
+            from CleanParadigms_main import read_lemmas, select_lemmas
+            forms = generated_forms(select_lemmas(read_lemmas(args.file_path), None, None, None))
+        else:
+            forms = dataset_forms(*args.dataset)
+        n_words, n_states, size = compile_automaton(forms, args.automaton)
+        print(f"Compiled {n_words} forms into {n_states} states ({size:,} bytes) - {args.automaton}")
+    with Form_Automaton(args.automaton) as automaton:
+        for word in args.words:
+            print(f"{word}\t{automaton.is_valid_form(word)}")
+        if args.prefix is not None:
+            for form in automaton.iter_forms_with_prefix(args.prefix):
+                print(form)
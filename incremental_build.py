@@ -0,0 +1,114 @@
+__author__ = "David Guriel"
+import os
+import json
+import hashlib
+from CleanParadigms_main import CONJUGATIONS_NAMES, build_paradigms, get_conjugation
+from utils import format_record_schema2
+
+MANIFEST_NAME = '.manifest.json'
+# The generation code - the lemmas' parameters, the PAA tables (utils.get_*_paas), the screeves (define_*_Screeves), the
+# output layout (sinks.Clean_Paradigm_Sink) and every module they import. A change in any of them invalidates all the outputs.
+CODE_FILES = ['CleanParadigms_main.py', 'Lemma.py', 'Screeve.py', 'utils.py', 'sinks.py', 'cells.py', 'profiling.py']
+
+
+def code_fingerprint():
+    h = hashlib.sha256()
+    for name in CODE_FILES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def lemma_key(class_choice, lemma): return f"{CONJUGATIONS_NAMES[class_choice]}/{lemma.translation}"
+
+def lemma_hash(lemma):
+    # the hash of the lemma's row, through the attributes its constructor sets - must be called before its forms are generated
+    return hashlib.sha256(json.dumps(vars(lemma), sort_keys=True, ensure_ascii=False, default=str).encode('utf8')).hexdigest()
+
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {'fingerprint': None, 'options': None, 'lemmas': {}}
+    with open(path, 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def splice_table(file_path, replacements):
+    """
+    Rewrites a merged table (in the format of katVerbsCompleteDataset.txt), where the rows of every lemma are contiguous:
+    the block of rows of every lemma_form in replacements is replaced by its new rows (or dropped if they are None). The rows
+    of lemma forms that aren't in the table yet are appended.
+    """
+    lines = []
+    if os.path.isfile(file_path):
+        with open(file_path, 'r', encoding='utf8') as f:
+            lines = [line for line in f if line.strip()]
+    out, replaced = [], set()
+    for line in lines:
+        lemma_form = line.split('\t', 1)[0]
+        if lemma_form not in replacements:
+            out.append(line)
+        elif lemma_form not in replaced: # the first row of the block - put the new rows in its place
+            replaced.add(lemma_form)
+            out.extend(replacements[lemma_form] or [])
+    for lemma_form, rows in replacements.items():
+        if lemma_form not in replaced and rows: out.extend(rows)
+    with open(file_path + '.tmp', 'w', encoding='utf8') as f:
+        f.writelines(out)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def incremental_build(jobs, use_unimorph_format, verbose, out_dir="Clean Paradigms", tables_dir=None, dataset_path=None, workers=None,
+                      prune=False):
+    """
+    Regenerates only the paradigms of the (class_choice, lemma) pairs whose rows changed since the last build (or all of them,
+    if the generation code or the output options changed), according to the manifest in out_dir.
+    :param tables_dir: if given, the regenerated lemmas are also spliced into its merged tables (<class name>.schema2.txt)
+    :param dataset_path: if given, the regenerated lemmas are also spliced into this complete dataset (katVerbsCompleteDataset.txt)
+    :param prune: whether the lemmas of the manifest that aren't in jobs were deleted from the lexicon - their outputs are removed
+    :return: the keys (<class name>/<translation>) of the regenerated lemmas
+    """
+    manifest = read_manifest(out_dir)
+    fingerprint, options = code_fingerprint(), [use_unimorph_format, verbose]
+    old_lemmas = manifest['lemmas'] if manifest['fingerprint'] == fingerprint and manifest['options'] == options else {}
+
+    hashes = {lemma_key(class_choice, lemma): lemma_hash(lemma) for class_choice, lemma in jobs}
+    dirty = [(class_choice, lemma) for class_choice, lemma in jobs
+             if old_lemmas.get(lemma_key(class_choice, lemma), {}).get('hash') != hashes[lemma_key(class_choice, lemma)]
+             or not os.path.isfile(os.path.join(out_dir, lemma_key(class_choice, lemma) + ".txt"))]
+    removed = [key for key in manifest['lemmas'] if key not in hashes] if prune else []
+
+    if dirty: build_paradigms(dirty, use_unimorph_format, verbose, out_dir, workers)
+    for key in removed:
+        if os.path.isfile(os.path.join(out_dir, key + ".txt")): os.remove(os.path.join(out_dir, key + ".txt"))
+
+    new_lemmas = dict(manifest['lemmas'])
+    for key in removed: del new_lemmas[key]
+    for class_choice, lemma in dirty:
+        lemma.gen_lemma_form(get_conjugation(class_choice).screeves) # the forms were generated by the workers
+        new_lemmas[lemma_key(class_choice, lemma)] = {'hash': hashes[lemma_key(class_choice, lemma)], 'lemma_form': lemma.lemma_form}
+
+    if tables_dir is not None or dataset_path is not None:
+        replacements = [{} for _ in CONJUGATIONS_NAMES] # per class: lemma_form -> its new rows, or None to drop them
+        for key in removed:
+            replacements[CONJUGATIONS_NAMES.index(key.split('/')[0])][manifest['lemmas'][key]['lemma_form']] = None
+        for class_choice, lemma in dirty:
+            old = manifest['lemmas'].get(lemma_key(class_choice, lemma))
+            if old is not None: replacements[class_choice].setdefault(old['lemma_form'], None) # the lemma_form may have changed
+            replacements[class_choice][lemma.lemma_form] = [format_record_schema2(record) for record in get_conjugation(class_choice).iter_forms(lemma)]
+        if tables_dir is not None:
+            for class_name, class_replacements in zip(CONJUGATIONS_NAMES, replacements):
+                if class_replacements: splice_table(os.path.join(tables_dir, class_name + ".schema2.txt"), class_replacements)
+        if dataset_path is not None and any(replacements):
+            splice_table(dataset_path, {k: v for class_replacements in replacements for k, v in class_replacements.items()})
+
+    write_manifest({'fingerprint': fingerprint, 'options': options, 'lemmas': new_lemmas}, out_dir)
+    return [lemma_key(class_choice, lemma) for class_choice, lemma in dirty]
@@ -0,0 +1,65 @@
+__author__ = "David Guriel"
+from CleanParadigms_main import CONJUGATIONS_NAMES, get_conjugation
+from cells import tags_cell, unpack_cell
+
+
+class Lemmas_Index:
+    """
+    Indexes the lemmas of all the classes by lemma_form (e.g. 'წერს'), by translation (e.g. 'write'), and by
+    '<class name>/<translation>' for translations that exist in several classes.
+    A lemma whose lemma_form can't be generated (e.g. because of a malformed row) isn't indexed, and its error is kept in
+    failed ('<class name>/<translation>' -> message) instead of failing the whole index.
+    """
+    def __init__(self, lemmas_dicts):
+        """:param lemmas_dicts: the lemmas, as returned by CleanParadigms_main.read_lemmas"""
+        self.conjugations = [get_conjugation(class_choice) for class_choice in range(len(lemmas_dicts))]
+        self.screeves = [{screeve.idx: screeve for screeve in conj.screeves} for conj in self.conjugations] # not all the classes have all the screeves
+        self.index = {} # lemma_form / translation / class_name/translation -> list of (class_choice, lemma)
+        self.failed = {}
+        for class_choice, lemmas in enumerate(lemmas_dicts):
+            for _, lemma in sorted(lemmas.items()):
+                try:
+                    lemma.gen_lemma_form(self.conjugations[class_choice].screeves)
+                except Exception as e:
+                    self.failed[f"{CONJUGATIONS_NAMES[class_choice]}/{lemma.translation}"] = f"{type(e).__name__}: {e}"
+                    continue
+                for key in {lemma.lemma_form, lemma.translation, f"{CONJUGATIONS_NAMES[class_choice]}/{lemma.translation}"}:
+                    self.index.setdefault(key, []).append((class_choice, lemma))
+
+    def resolve(self, key):
+        """returns the (class_choice, lemma) of a key"""
+        if key not in self.index:
+            failures = [f"{name} ({error})" for name, error in self.failed.items() if key in {name, name.split('/', 1)[1]}]
+            raise KeyError(f"Unknown lemma: {key}" + (" - failed to generate its lemma form: " + ', '.join(failures) if failures else ''))
+        if len(self.index[key]) > 1:
+            raise Exception(f"Ambiguous lemma: {key} - use one of " + ', '.join(f"{CONJUGATIONS_NAMES[c]}/{lemma.translation}" for c, lemma in self.index[key]))
+        return self.index[key][0]
+
+    def inflect_many(self, queries):
+        """
+        Generates only the requested cells: the queries are grouped by lemma and screeve, so that the specifications of every
+        screeve are computed once per lemma, and only the requested forms are formulated.
+        :param queries: (lemma, tags) pairs - the lemma as in resolve, the tags in either schema (e.g. 'V;s1;sSG;o3;oSG;IND;PRS')
+        :return: the form of every query, in order (None for cells that the lemma doesn't have)
+        """
+        forms = [None] * len(queries)
+        groups = {} # (class_choice, lemma's id, screeve idx) -> [(query's index, p_obj, p_subj)]
+        for i, (key, tags) in enumerate(queries):
+            class_choice, lemma = self.resolve(key)
+            screeve_idx, p_subj, p_obj, aspect = unpack_cell(tags_cell(tags))
+            if screeve_idx == 'MSDR':
+                forms[i] = next((record.form for record in lemma.iter_masdars() if record.aspect == aspect), None)
+                continue
+            if screeve_idx == 'IMP': # the Imperatives are taken from the 7th screeve (2nd persons) or the 8th (the rest)
+                screeve_idx = 7 if p_subj in {'sg2', 'pl2'} else 8
+                screeve = self.screeves[class_choice].get(screeve_idx)
+                if screeve is None or p_obj not in screeve.paas or p_subj not in screeve.imperative_subjects(p_obj): continue
+            if screeve_idx not in self.screeves[class_choice] or hasattr(lemma, 'exist_screeves') and screeve_idx not in lemma.exist_screeves: continue
+            groups.setdefault((class_choice, id(lemma), screeve_idx), (lemma, []))[1].append((i, p_obj, p_subj))
+
+        for (class_choice, _, screeve_idx), (lemma, cells) in groups.items():
+            screeve = self.screeves[class_choice][screeve_idx]
+            plan = screeve.screeve_specifications(lemma)
+            for i, p_obj, p_subj in cells:
+                forms[i] = screeve.formulate_cell(plan, p_obj, p_subj)
+        return forms
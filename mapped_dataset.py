@@ -0,0 +1,97 @@
+__author__ = "David Guriel"
+import os
+import json
+import mmap
+
+INDEX_SUFFIX = '.offsets.json'
+
+
+def build_offsets_index(dataset_path, tables_dir="Final Tables By Classes"):
+    """
+    Builds the sidecar index of a dataset file (in the format of katVerbsCompleteDataset.txt): the byte ranges of the rows of
+    every lemma_form, and the lemma forms of every class. The classes are taken from the tables in tables_dir (<class>.*.txt),
+    and are skipped if it doesn't exist.
+    """
+    lemmas = {} # lemma_form -> list of [start, end) byte ranges (a single range when the lemma's rows are contiguous)
+    offset = 0
+    with open(dataset_path, 'rb') as f:
+        for line in f:
+            lemma = line.split(b'\t', 1)[0].decode('utf8')
+            ranges = lemmas.setdefault(lemma, [])
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = offset + len(line)
+            else:
+                ranges.append([offset, offset + len(line)])
+            offset += len(line)
+
+    classes = {}
+    if tables_dir is not None and os.path.isdir(tables_dir):
+        for name in sorted(os.listdir(tables_dir)):
+            if not name.endswith('.txt'): continue
+            with open(os.path.join(tables_dir, name), 'r', encoding='utf8') as f:
+                table_lemmas = dict.fromkeys(line.split('\t', 1)[0] for line in f if line.strip())
+            classes[name.split('.')[0]] = [lemma for lemma in table_lemmas if lemma in lemmas]
+    stat = os.stat(dataset_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'lemmas': lemmas, 'classes': classes}
+
+
+class Mapped_Dataset:
+    """
+    Random access to the paradigms of a dataset file by lemma_form or by class, through a memory map of the file and a small
+    sidecar index of offsets (<dataset>.offsets.json, built on the first use). Fetching a paradigm decodes only its slice of
+    the file, and processes that map the same file share its pages in the OS page cache.
+    """
+    def __init__(self, dataset_path="katVerbsCompleteDataset.txt", index_path=None, tables_dir="Final Tables By Classes"):
+        self.dataset_path = dataset_path
+        self.index_path = index_path or dataset_path + INDEX_SUFFIX
+        self.index = self._load_index(tables_dir)
+        self.file = open(dataset_path, 'rb')
+        if self.index['size'] == 0: # an empty file can't be mapped - it is an empty dataset
+            self.buffer = b''
+        else:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_index(self, tables_dir):
+        stat = os.stat(self.dataset_path)
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, 'r', encoding='utf8') as f:
+                index = json.load(f)
+            if index['size'] == stat.st_size and index['mtime'] == stat.st_mtime:
+                return index
+        index = build_offsets_index(self.dataset_path, tables_dir) # missing or stale
+        with open(self.index_path, 'w', encoding='utf8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        return index
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap): self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, lemma_form):
+        return lemma_form in self.index['lemmas']
+
+    def lemmas(self, class_name=None):
+        """returns the lemma forms of the dataset, or of a single class (e.g. 'Transitive')"""
+        if class_name is None:
+            return list(self.index['lemmas'])
+        return list(self.index['classes'][class_name])
+
+    def paradigm(self, lemma_form):
+        """returns the (form, tags) pairs of a lemma, in the order of the dataset"""
+        res = []
+        for start, end in self.index['lemmas'][lemma_form]:
+            for line in self.buffer[start:end].decode('utf8').splitlines():
+                _, form, tags = line.split('\t')
+                res.append((form, tags))
+        return res
+
+    def paradigms(self, class_name):
+        """yields the (lemma_form, paradigm) pairs of all the lemmas of a class"""
+        for lemma_form in self.index['classes'][class_name]:
+            yield lemma_form, self.paradigm(lemma_form)
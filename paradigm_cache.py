@@ -0,0 +1,66 @@
+__author__ = "David Guriel"
+import sys
+import threading
+from collections import OrderedDict
+from inflection import Lemmas_Index
+
+
+def paradigm_size(paradigm):
+    """an estimate of the memory (bytes) of a paradigm - a list of FormRecords - not counting the strings it shares with the lemma"""
+    return sys.getsizeof(paradigm) + sum(sys.getsizeof(record) + sys.getsizeof(record.form) for record in paradigm)
+
+
+class Paradigm_Cache(Lemmas_Index):
+    """
+    Generates paradigms on demand from the Lemma objects, and keeps them in a bounded LRU cache, so that the frequent lemmas
+    are never regenerated and the rest aren't materialized at all.
+    The lemmas are looked up as in Lemmas_Index: by lemma_form (e.g. 'წერს'), by translation (e.g. 'write'), or by
+    '<class name>/<translation>' when a translation exists in several classes. The lemmas whose lemma forms fail to generate
+    aren't served - they're listed in failed, and counted in stats().
+    """
+    def __init__(self, lemmas_dicts, max_entries=256, max_bytes=None):
+        """
+        :param lemmas_dicts: the lemmas, as returned by CleanParadigms_main.read_lemmas
+        :param max_entries: the maximal number of cached paradigms
+        :param max_bytes: the memory budget of the cached paradigms (see paradigm_size), or None for no budget
+        """
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        super().__init__(lemmas_dicts)
+        self.cache = OrderedDict() # (class_choice, translation) -> (paradigm, size), from the least to the most recently used
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.bytes = 0
+
+    def get_paradigm(self, key):
+        """returns the FormRecords of a lemma's paradigm (see Lemma.iter_forms) - generated on the first request, then cached"""
+        class_choice, lemma = self.resolve(key)
+        cache_key = (class_choice, lemma.translation)
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                self.hits += 1
+                return self.cache[cache_key][0]
+            self.misses += 1
+        paradigm = list(self.conjugations[class_choice].iter_forms(lemma)) # outside the lock - the screeves are shared safely
+        size = paradigm_size(paradigm)
+        with self.lock:
+            if cache_key not in self.cache: # unless another thread has just generated it
+                self.cache[cache_key] = (paradigm, size)
+                self.bytes += size
+                self._evict()
+            return paradigm
+
+    def _evict(self):
+        # the least recently used paradigms are dropped until the cache is within its bounds - the newest one is always kept
+        while len(self.cache) > 1 and (len(self.cache) > self.max_entries or self.max_bytes is not None and self.bytes > self.max_bytes):
+            _, (_, size) = self.cache.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self.cache), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'failed': len(self.failed)}
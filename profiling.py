@@ -0,0 +1,104 @@
+__author__ = "David Guriel"
+import os
+import json
+import time
+from contextlib import nullcontext
+
+# Opt-in instrumentation of the generation pipeline. The pipeline marks its frames with profiled('kind:value', ...) - e.g.
+# 'class:Transitive', 'lemma:write', 'screeve:7', 'phase:formulation' - which does nothing unless a Profiler is enabled.
+# A frame's path is the labels of all the frames it is nested in, so the timings can be rolled up per class, per lemma,
+# per screeve and per phase, or dumped as a flamegraph.
+
+_profiler = None # the enabled Profiler, if any
+_NO_FRAME = nullcontext()
+
+
+def profiled(*labels):
+    """a context manager that times its block as a frame named by the labels (in the enabled Profiler, if any)"""
+    if _profiler is None: return _NO_FRAME
+    return _Frame(_profiler, labels)
+
+
+def enable_profiling():
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable_profiling():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+class _Frame:
+    __slots__ = ['profiler', 'labels', 'start']
+
+    def __init__(self, profiler, labels):
+        self.profiler, self.labels = profiler, labels
+
+    def __enter__(self):
+        self.profiler.stack.extend(self.labels)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        stack = self.profiler.stack
+        for i in range(len(self.labels)): # every label is a frame of its own, and all of them took the time of the block
+            path = tuple(stack[:len(stack)-i])
+            stat = self.profiler.stats.setdefault(path, [0, 0.0])
+            stat[0] += 1
+            stat[1] += end - self.start
+            self.profiler.events.append((path, self.start, end - self.start))
+        del stack[len(stack)-len(self.labels):]
+
+
+class Profiler:
+    def __init__(self):
+        self.stack = [] # the labels of the frames currently entered
+        self.stats = {} # path (tuple of labels) -> [calls, total seconds]
+        self.events = [] # (path, start, seconds) of every frame, for the trace
+        self.origin = time.perf_counter()
+
+    def self_seconds(self):
+        """returns the seconds spent in every path itself, excluding its child frames"""
+        res = {path: stat[1] for path, stat in self.stats.items()}
+        for path, stat in self.stats.items():
+            if len(path) > 1 and path[:-1] in res:
+                res[path[:-1]] -= stat[1]
+        return res
+
+    def rollup(self, kind):
+        """returns {value: [calls, seconds]} of the frames of a kind (e.g. 'screeve'), summed over all their paths"""
+        res = {}
+        for path, (calls, seconds) in self.stats.items():
+            k, _, value = path[-1].partition(':')
+            if k != kind: continue
+            stat = res.setdefault(value, [0, 0.0])
+            stat[0] += calls
+            stat[1] += seconds
+        return res
+
+    def to_dict(self):
+        return {'paths': [{'path': list(path), 'calls': calls, 'seconds': seconds} for path, (calls, seconds) in self.stats.items()],
+                **{f"by_{kind}": {value: {'calls': calls, 'seconds': seconds} for value, (calls, seconds) in self.rollup(kind).items()}
+                   for kind in ['class', 'lemma', 'screeve', 'phase']}}
+
+    def dump(self, file_path, dump_format='json'):
+        """
+        :param dump_format: 'json' - the stats of every path and the rollups per class/lemma/screeve/phase,
+                            'trace' - Chrome trace events (for chrome://tracing, Perfetto or speedscope),
+                            'folded' - collapsed stacks with self microseconds (for flamegraph.pl / inferno)
+        """
+        with open(file_path, 'w', encoding='utf8') as f:
+            if dump_format == 'json':
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+            elif dump_format == 'trace':
+                json.dump({'traceEvents': [{'name': path[-1], 'cat': path[-1].partition(':')[0], 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                                            'ts': (start - self.origin) * 1e6, 'dur': seconds * 1e6, 'args': {'path': ';'.join(path)}}
+                                           for path, start, seconds in self.events]}, f, ensure_ascii=False)
+            elif dump_format == 'folded':
+                for path, seconds in self.self_seconds().items():
+                    f.write(f"{';'.join(path)} {max(0, round(seconds * 1e6))}\n")
+            else:
+                raise Exception("Unknown dump format!")
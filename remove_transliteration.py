@@ -1,13 +1,108 @@
+import os
 import re
 import sys
+import shutil
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def remove_transliteration(file_name):
+# The verbose headers ("#15 - ენანება - be_a_shame:", "Screeve #1:") and transliterations (" = genanebi") of the data files,
+# removed in a single pass per line.
+VERBOSE_PATTERN = re.compile(r'Screeve #\d+:\n|#\d+ - .+ - .+:| = .+')
+
+CHUNK_SIZE = 1 << 20 # the characters copied at a time from the workers' outputs into a merged stream
+
+def strip_line(line): return VERBOSE_PATTERN.sub('', line)
+
+def remove_transliteration(file_name, out_path=None):
+	# streams a file to out_path (by default <name>_raw.txt next to it) - a line at a time
 	with open(file_name,'r',encoding='utf8') as f:
-		with open(file_name[:-4]+"_raw.txt",'w+',encoding='utf8') as fout:
+		with open(out_path or file_name[:-4]+"_raw.txt",'w+',encoding='utf8') as fout:
 			for line in f:
-				line = re.sub('#\d+ - .+ - .+:','',line)
-				line = re.sub('Screeve #\d+:\n','',line)
-				line = re.sub(' = .+','',line)
-				fout.write(line)
+				fout.write(strip_line(line))
+
+def stripped_text(file_name):
+	with open(file_name,'r',encoding='utf8') as f:
+		return ''.join(strip_line(line) for line in f)
+
+def strip_to_temp(file_name, tmp_dir):
+	# streams a file into a new temporary file in tmp_dir, and returns its path - so that a worker never holds a whole file
+	fd, tmp_path = tempfile.mkstemp(suffix='.txt', dir=tmp_dir)
+	os.close(fd)
+	remove_transliteration(file_name, tmp_path)
+	return tmp_path
+
+def iter_input_files(paths, skip_raw=True):
+	"""
+	yields (path, relative path) of the .txt files given, where directories are walked recursively (e.g. 'Clean Paradigms')
+	:param skip_raw: skip the *_raw.txt files in the directories - the outputs of previous runs of remove_transliteration
+	"""
+	for path in paths:
+		if not os.path.isdir(path):
+			yield path, os.path.basename(path)
+			continue
+		for root, dirs, files in os.walk(path):
+			dirs.sort()
+			for name in sorted(files):
+				if name.endswith('.txt') and not (skip_raw and name.endswith('_raw.txt')):
+					yield os.path.join(root, name), os.path.relpath(os.path.join(root, name), path)
+
+def _bounded_map(executor, func, items, window):
+	# as executor.map, but only `window` tasks are in flight, so the memory of the pending results is bounded
+	pending = deque()
+	for item in items:
+		pending.append(executor.submit(func, *item))
+		if len(pending) >= window:
+			yield pending.popleft().result()
+	while pending:
+		yield pending.popleft().result()
+
+def process(paths, out_dir=None, stream=None, workers=None):
+	"""
+	Removes the verbose headers and transliterations of all the files in paths, using a process pool over the files.
+	:param out_dir: write the outputs into this directory (mirroring the input trees), instead of <name>_raw.txt next to the inputs
+	:param stream: write all the outputs, in order, into this single stream (e.g. sys.stdout) instead
+	"""
+	files = list(iter_input_files(paths))
+	window = 2 * (workers or os.cpu_count() or 1)
+	with ProcessPoolExecutor(workers) as executor:
+		if stream is not None:
+			# the workers write into temporary files, which are copied into the stream in order, in bounded chunks
+			tmp_dir = tempfile.mkdtemp(prefix='remove_transliteration-')
+			try:
+				for tmp_path in _bounded_map(executor, strip_to_temp, [(path, tmp_dir) for path, _ in files], window):
+					with open(tmp_path,'r',encoding='utf8') as f:
+						shutil.copyfileobj(f, stream, CHUNK_SIZE)
+					os.remove(tmp_path)
+			finally:
+				shutil.rmtree(tmp_dir, ignore_errors=True)
+			return
+		jobs = []
+		for path, rel_path in files:
+			out_path = None
+			if out_dir is not None:
+				out_path = os.path.join(out_dir, rel_path)
+				os.makedirs(os.path.dirname(out_path), exist_ok=True)
+			jobs.append((path, out_path))
+		for _ in _bounded_map(executor, remove_transliteration, jobs, window): pass
+
+if __name__=='__main__':
+	parser = argparse.ArgumentParser(description="Removes the verbose headers and transliterations of data files (e.g. 'Clean Paradigms'). "
+												 "By default, every <name>.txt is written to <name>_raw.txt next to it.")
+	parser.add_argument('paths', nargs='+', help="Data files (.txt, in the format of the data files) or directories of them")
+	output = parser.add_mutually_exclusive_group()
+	output.add_argument('-o', '--out-dir', help="Write the outputs into this directory, mirroring the input directories")
+	output.add_argument('--stdout', action='store_true', help="Write all the outputs, in order, to stdout")
+	output.add_argument('--merge', help="Write all the outputs, in order, into this single file")
+	parser.add_argument('-j', '--workers', type=int, help="Number of worker processes (default: the number of CPUs)")
+	args = parser.parse_args()
 
-remove_transliteration(sys.argv[1]) # must be a .txt file in the format of the data files.
\ No newline at end of file
+	if args.merge:
+		with open(args.merge,'w',encoding='utf8') as fout:
+			process(args.paths, stream=fout, workers=args.workers)
+	elif args.stdout:
+		sys.stdout.reconfigure(encoding='utf8')
+		process(args.paths, stream=sys.stdout, workers=args.workers)
+	else:
+		process(args.paths, out_dir=args.out_dir, workers=args.workers)
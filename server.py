@@ -0,0 +1,176 @@
+__author__ = "David Guriel"
+import json
+import asyncio
+from cells import record_cell, cell_tags, tags_cell
+
+# A local inflection / analysis service. The lexicon is loaded once, and the clients send JSON requests, one per line:
+#   {"op": "inflect", "lemma": "write", "tags": "V;s1;sSG;o3;oSG;IND;PRS"}   -> {"forms": ["ვწერ"]}
+#   {"op": "paradigm", "lemma": "წერს"}                                       -> {"lemma_form": "წერს", "forms": [[form, tags], ...]}
+#   {"op": "analyze", "form": "ვწერ"}                                         -> {"analyses": [[lemma_form, tags], ...]}
+# and get a JSON response per line, in order ({"error": ...} on failure). The tags of inflect may be in either schema.
+# The requests of all the clients are coalesced into micro-batches, and every batch is processed at once in a thread: each
+# distinct lemma of the batch is generated (or taken from the cache) once, and each distinct form is analyzed once.
+
+
+def _field(request, name):
+    if name not in request: raise Exception(f"Missing field: {name}")
+    return request[name]
+
+
+class Service:
+    """the synchronous part of the service - processes a batch of requests (dictionaries), returning their responses"""
+    def __init__(self, paradigm_cache=None, analyzer=None):
+        self.paradigm_cache, self.analyzer = paradigm_cache, analyzer
+
+    def process_batch(self, requests):
+        paradigms, analyses = {}, {}
+        responses = []
+        for request in requests:
+            try:
+                op = request.get('op')
+                if op in {'inflect', 'paradigm'}:
+                    if self.paradigm_cache is None: raise Exception("No lexicon was loaded")
+                    lemma = _field(request, 'lemma')
+                    if lemma not in paradigms:
+                        paradigm = self.paradigm_cache.get_paradigm(lemma)
+                        cells = {}
+                        for record in paradigm: cells.setdefault(record_cell(record), []).append(record.form)
+                        paradigms[lemma] = (paradigm, cells)
+                    paradigm, cells = paradigms[lemma]
+                    if op == 'inflect':
+                        responses.append({'forms': cells.get(tags_cell(_field(request, 'tags')), [])})
+                    else:
+                        responses.append({'lemma_form': paradigm[0].lemma_form if paradigm else None,
+                                          'forms': [[record.form, cell_tags(record_cell(record))] for record in paradigm]})
+                elif op == 'analyze':
+                    if self.analyzer is None: raise Exception("No analyzer was loaded")
+                    form = _field(request, 'form')
+                    if form not in analyses:
+                        analyses[form] = [list(analysis) for analysis in self.analyzer.analyze(form)]
+                    responses.append({'analyses': analyses[form]})
+                else:
+                    raise Exception(f"Unknown op: {op}")
+            except Exception as e:
+                responses.append({'error': str(e) if not isinstance(e, KeyError) else str(e.args[0])})
+        return responses
+
+
+class Batcher:
+    """
+    Coalesces the requests that arrive within batch_window seconds of each other (up to max_batch of them) into a single
+    call of process_batch, which runs in a thread so that the event loop keeps accepting requests meanwhile.
+    """
+    def __init__(self, process_batch, batch_window=0.002, max_batch=256):
+        self.process_batch, self.batch_window, self.max_batch = process_batch, batch_window, max_batch
+        self.queue = asyncio.Queue()
+        self.batches = self.requests = 0
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0: break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                responses = await loop.run_in_executor(None, self.process_batch, [request for request, _ in batch])
+            except Exception as e:
+                responses = [{'error': str(e)}] * len(batch)
+            for (_, future), response in zip(batch, responses):
+                if not future.cancelled(): future.set_result(response)
+
+
+async def handle_client(batcher, reader, writer):
+    # the responses are written in the order of the client's requests, while its next requests are already being batched
+    pending = asyncio.Queue()
+    async def write_responses():
+        try:
+            while True:
+                task = await pending.get()
+                if task is None: break
+                writer.write((json.dumps(await task, ensure_ascii=False) + '\n').encode('utf8'))
+                await writer.drain()
+        except ConnectionError:
+            pass # the client has disconnected - its remaining requests are cancelled below
+    writer_task = asyncio.create_task(write_responses())
+    try:
+        while not writer_task.done() and (line := await reader.readline()):
+            if not line.strip(): continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict): raise ValueError("A request must be a JSON object")
+            except ValueError as e:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result({'error': f"Bad request: {e}"})
+                await pending.put(future)
+                continue
+            await pending.put(asyncio.ensure_future(batcher.submit(request)))
+    except ConnectionError:
+        pass
+    finally:
+        await pending.put(None)
+        await writer_task
+        while not pending.empty(): # the requests whose responses can't be written anymore
+            task = pending.get_nowait()
+            if task is not None: task.cancel()
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8765, batch_window=0.002, max_batch=256):
+    batcher = Batcher(service.process_batch, batch_window, max_batch)
+    batcher_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(lambda r, w: handle_client(batcher, r, w), host, port)
+    print(f"Serving on {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+
+
+if __name__=='__main__':
+    import os
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description="Serves inflection, paradigms and analysis of the lexicon over a JSON-lines TCP protocol")
+    parser.add_argument("--file_path", help="The Excel file of the lemmas, for inflect & paradigm (its lexicon cache is used when valid)")
+    parser.add_argument("--dataset", default="katVerbsCompleteDataset.txt", help="The dataset file (or directory of tables) to analyze by ('' for none)")
+    parser.add_argument("--index", help="A persisted analysis index (see analysis.py --save) to load instead of the dataset")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch_window_ms", type=float, default=2.0, help="How long to wait for more requests to join a batch")
+    parser.add_argument("--max_batch", type=int, default=256)
+    parser.add_argument("--cache_entries", type=int, default=256, help="How many paradigms to keep cached")
+    args = parser.parse_args()
+
+    paradigm_cache = analyzer = None
+    if args.file_path:
+        from CleanParadigms_main import read_lemmas
+        from paradigm_cache import Paradigm_Cache
+        try:
+            paradigm_cache = Paradigm_Cache(read_lemmas(args.file_path), max_entries=args.cache_entries)
+        except Exception as e:
+            parser.exit(1, f"Failed to load the lexicon {args.file_path}: {type(e).__name__}: {e}\n")
+        for name, error in paradigm_cache.failed.items(): # served without these lemmas
+            print(f"Skipping {name}: {error}", file=sys.stderr)
+    if args.index or args.dataset:
+        from analysis import Table_Analyzer
+        try:
+            if args.index: analyzer = Table_Analyzer.load(args.index)
+            elif os.path.isdir(args.dataset): analyzer = Table_Analyzer.from_tables(args.dataset)
+            else: analyzer = Table_Analyzer.from_dataset(args.dataset)
+        except Exception as e:
+            parser.exit(1, f"Failed to load the analysis index {args.index or args.dataset}: {type(e).__name__}: {e}\n")
+    asyncio.run(serve(Service(paradigm_cache, analyzer), args.host, args.port, args.batch_window_ms / 1000, args.max_batch))
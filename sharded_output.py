@@ -0,0 +1,162 @@
+__author__ = "David Guriel"
+import io
+import os
+import json
+import zlib
+import hashlib
+from CleanParadigms_main import CONJUGATIONS_NAMES, gen_paradigm_text
+from Screeve import with_formulation_stats, merge_formulation_stats
+from incremental_build import lemma_key
+
+# Writes the paradigms into shards - by class, and by buckets of the lemmas' hashes - instead of a file per lemma:
+# <out_dir>/<class name>/part-<bucket>.txt[.gz|.xz|.zst], each holding the texts of its lemmas in the order of the jobs.
+# A shard is streamed through its compressor into a temporary file, which is renamed into place only once it's complete,
+# and the manifest (<out_dir>/manifest.json) records the lemmas, rows, size and sha256 of every shard - so that consumers can
+# process the shards in parallel, and check them.
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIONS_EXTENSIONS = {'none': '', 'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+
+def lemma_bucket(class_choice, lemma, buckets):
+    # a stable hash (unlike hash(), which is salted per process), so that a lemma stays in its shard across builds
+    return zlib.crc32(lemma_key(class_choice, lemma).encode('utf8')) % buckets
+
+
+def shard_path(class_choice, bucket, compression):
+    return os.path.join(CONJUGATIONS_NAMES[class_choice], f"part-{bucket:05d}.txt" + COMPRESSIONS_EXTENSIONS[compression])
+
+
+class _Hashing_File:
+    """a binary file that hashes and counts the bytes written into it - i.e. the compressed bytes"""
+    def __init__(self, file):
+        self.file, self.sha256, self.bytes = file, hashlib.sha256(), 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.file.write(data)
+
+    def flush(self): self.file.flush()
+
+
+def _compressor(file, compression):
+    # a binary stream that compresses into file - closing it doesn't close file
+    if compression == 'none':
+        return file
+    if compression == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=file, mode='wb', mtime=0) # no timestamp, so that identical shards have identical checksums
+    if compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(file, 'wb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception("zstd compression requires the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+    raise Exception("Unknown compression!")
+
+
+def _open_decompressor(path, compression):
+    if compression == 'none':
+        return open(path, 'rb')
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, 'rb')
+    if compression == 'xz':
+        import lzma
+        return lzma.open(path, 'rb')
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    raise Exception("Unknown compression!")
+
+
+def count_rows(text):
+    """the number of forms in a paradigm's text - its lines, without the blank lines and the verbose headers"""
+    return sum(1 for line in text.splitlines() if line and not line.startswith(('#', 'Screeve #')))
+
+
+def write_shard(out_dir, path, compression, jobs, use_unimorph_format, verbose):
+    """generates the (class_choice, lemma) jobs into a single shard, atomically; returns its manifest entry"""
+    final_path = os.path.join(out_dir, path)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(final_path), f".{os.path.basename(final_path)}.{os.getpid()}.tmp")
+    rows = 0
+    try:
+        with open(tmp_path, 'wb') as raw:
+            hashing = _Hashing_File(raw)
+            stream = _compressor(hashing, compression)
+            for class_choice, lemma in jobs:
+                text = gen_paradigm_text(class_choice, lemma, use_unimorph_format, verbose)
+                rows += count_rows(text)
+                stream.write(text.encode('utf8'))
+            if stream is not hashing: stream.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    return {'path': path.replace(os.sep, '/'), 'lemmas': len(jobs), 'rows': rows, 'bytes': hashing.bytes, 'sha256': hashing.sha256.hexdigest()}
+
+
+def _write_shard_job(args): return with_formulation_stats(write_shard, *args)
+
+
+def build_shards(jobs, use_unimorph_format, verbose, out_dir="Sharded Paradigms", buckets=16, compression='gzip', workers=None):
+    """
+    Generates the (class_choice, lemma) jobs into the shards of every class, over a process pool (a shard per task), and
+    writes the manifest. Returns the manifest.
+    :param buckets: the number of lemma-hash buckets (i.e. the maximal number of shards) per class
+    """
+    shards = {} # (class_choice, bucket) -> jobs
+    for class_choice, lemma in jobs:
+        shards.setdefault((class_choice, lemma_bucket(class_choice, lemma, buckets)), []).append((class_choice, lemma))
+    tasks = [(out_dir, shard_path(class_choice, bucket, compression), compression, shard_jobs, use_unimorph_format, verbose)
+             for (class_choice, bucket), shard_jobs in sorted(shards.items())]
+    if workers == 1:
+        entries = [entry for entry, _ in map(_write_shard_job, tasks)] # the stats are already counted in this process
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            entries = list(merge_formulation_stats(executor.map(_write_shard_job, tasks)))
+    for ((class_choice, bucket), _), entry in zip(sorted(shards.items()), entries):
+        entry.update({'class': CONJUGATIONS_NAMES[class_choice], 'bucket': bucket})
+
+    manifest = {'compression': compression, 'buckets': buckets, 'use_unimorph_format': use_unimorph_format, 'verbose': verbose,
+                'rows': sum(entry['rows'] for entry in entries), 'shards': entries}
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def read_manifest(out_dir="Sharded Paradigms"):
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+def iter_shard_lines(out_dir, entry, compression):
+    """yields the (decompressed) lines of a shard, given its manifest entry"""
+    with _open_decompressor(os.path.join(out_dir, entry['path']), compression) as f:
+        yield from io.TextIOWrapper(f, encoding='utf8')
+
+
+def verify_shards(out_dir="Sharded Paradigms"):
+    """returns the paths of the shards whose size or checksum differ from the manifest's (or that are missing)"""
+    bad = []
+    for entry in read_manifest(out_dir)['shards']:
+        path = os.path.join(out_dir, entry['path'])
+        if not os.path.isfile(path) or os.path.getsize(path) != entry['bytes']:
+            bad.append(entry['path'])
+            continue
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+        if sha256.hexdigest() != entry['sha256']: bad.append(entry['path'])
+    return bad
@@ -0,0 +1,134 @@
+__author__ = "David Guriel"
+import abc
+import json
+from utils import format_record, transliterate_many
+from cells import CELLS_TAGS, record_cell
+
+# The destinations of the generated forms. The generation (Lemma.write_paradigm) hands a sink the FormRecords in batches -
+# the forms of a screeve together with its Imperatives, and the Masdars of a lemma - and the sink formats every batch at
+# once, into a buffer that is written to its file in large chunks. The format is chosen at run time by the sink's class.
+
+
+class Sink:
+    def begin_lemma(self, lemma): pass
+
+    def write_screeve(self, screeve_idx, records):
+        """:param records: the FormRecords of the screeve, followed by its Imperatives (as yielded by Screeve.iter_forms)"""
+        self.write_records(records)
+
+    def write_masdars(self, records): self.write_records(records)
+
+    def end_lemma(self): pass
+
+    @abc.abstractmethod
+    def write_records(self, records):
+        pass
+
+    def flush(self): pass
+
+    def close(self): self.flush()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+
+class Buffered_Sink(Sink):
+    """a sink of text, which is written to its file whenever buffer_size characters have accumulated"""
+    def __init__(self, file, buffer_size=1 << 16):
+        self.file, self.buffer_size = file, buffer_size
+        self.buffer, self.buffered = [], 0
+
+    def _write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size: self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(''.join(self.buffer))
+            self.buffer, self.buffered = [], 0
+
+
+class Clean_Paradigm_Sink(Buffered_Sink):
+    """the layout of the Clean Paradigms files - plain forms or the UniMorph format, verbose (with headers and transliterations) or not"""
+    def __init__(self, file, use_unimorph_format, verbose, buffer_size=1 << 16):
+        super().__init__(file, buffer_size)
+        self.use_unimorph_format, self.verbose = use_unimorph_format, verbose
+
+    def _lines(self, records):
+        if not self.verbose:
+            return ''.join(format_record(record, self.use_unimorph_format, False) for record in records)
+        transliterations = transliterate_many([record.form for record in records]) # of the whole batch at once
+        return ''.join(format_record(record, self.use_unimorph_format, True, eng) for record, eng in zip(records, transliterations))
+
+    def begin_lemma(self, lemma):
+        if self.verbose: self._write(f"#{lemma.idx} - {lemma.lemma_form} - {lemma.translation}:\n")
+
+    def write_screeve(self, screeve_idx, records):
+        forms = [record for record in records if record.screeve != 'IMP']
+        imperatives = [record for record in records if record.screeve == 'IMP']
+        text = (f'Screeve #{screeve_idx}:\n' if self.verbose else '') + self._lines(forms)
+        if imperatives: text += '\n' + self._lines(imperatives) # only the 7th & 8th screeves have Imperatives
+        self._write(text + ('\n\n\n' if screeve_idx in {7,8} else '\n\n'))
+
+    def write_records(self, records):
+        self._write(self._lines(records))
+
+
+class TSV_Sink(Buffered_Sink):
+    """lemma, form and tags rows, as in katVerbsCompleteDataset.txt - the tags in any of the schemas of cells.CELLS_TAGS"""
+    def __init__(self, file, schema='schema2', buffer_size=1 << 16):
+        super().__init__(file, buffer_size)
+        self.tags = CELLS_TAGS[schema]
+
+    def write_records(self, records):
+        tags = self.tags
+        self._write(''.join(f"{record.lemma_form}\t{record.form}\t{tags[record_cell(record)]}\n" for record in records))
+
+
+class JSONL_Sink(Buffered_Sink):
+    """a JSON object per form, with its tags and its cell's fields"""
+    def __init__(self, file, schema='schema2', buffer_size=1 << 16):
+        super().__init__(file, buffer_size)
+        self.tags = CELLS_TAGS[schema]
+
+    def write_records(self, records):
+        tags = self.tags
+        self._write(''.join(json.dumps({'lemma': record.lemma_form, 'form': record.form, 'tags': tags[record_cell(record)],
+                                        'screeve': record.screeve, 'subject': record.subject, 'object': record.object,
+                                        'aspect': record.aspect}, ensure_ascii=False) + '\n' for record in records))
+
+
+class Memory_Sink(Sink):
+    """collects the FormRecords in a list"""
+    def __init__(self):
+        self.records = []
+
+    def write_records(self, records): self.records.extend(records)
+
+
+class Null_Sink(Sink):
+    """only counts the lemmas and forms - for measuring the generation without the output"""
+    def __init__(self):
+        self.lemmas = self.records = 0
+
+    def begin_lemma(self, lemma): self.lemmas += 1
+
+    def write_records(self, records): self.records += len(records)
+
+
+SINKS_FORMATS = ['clean', 'unimorph', 'verbose', 'tsv', 'jsonl', 'null']
+
+def make_sink(sink_format, file=None, schema='schema2'):
+    """
+    returns a sink of a format: 'clean' (plain forms), 'unimorph' and 'verbose' (as the Clean Paradigms files of -u and -u -v),
+    'tsv', 'jsonl' or 'null' (which takes no file)
+    """
+    if sink_format == 'clean': return Clean_Paradigm_Sink(file, False, False)
+    if sink_format == 'unimorph': return Clean_Paradigm_Sink(file, True, False)
+    if sink_format == 'verbose': return Clean_Paradigm_Sink(file, True, True)
+    if sink_format == 'tsv': return TSV_Sink(file, schema)
+    if sink_format == 'jsonl': return JSONL_Sink(file, schema)
+    if sink_format == 'null': return Null_Sink()
+    raise Exception("Unknown sink format!")
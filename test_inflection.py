@@ -0,0 +1,41 @@
+__author__ = "David Guriel"
+import pytest
+from CleanParadigms_main import CONJUGATIONS_CODES, CONJUGATIONS_NAMES, Conjugation
+from benchmarks import BENCH_ROWS
+from cells import record_cell, cell_tags
+from inflection import Lemmas_Index
+
+
+def bench_lemmas_dicts():
+    """the lemmas of BENCH_ROWS, in the format of CleanParadigms_main.read_lemmas - rows of all the five classes"""
+    return [{(idx+1): Conjugation.gen_lemma_object(row, conj) for idx, row in enumerate(BENCH_ROWS[conj])} for conj in CONJUGATIONS_CODES]
+
+
+def test_index_all_classes():
+    index = Lemmas_Index(bench_lemmas_dicts())
+    assert index.failed == {}
+    for class_choice, conj in enumerate(CONJUGATIONS_CODES):
+        for row in BENCH_ROWS[conj]:
+            c, lemma = index.resolve(f"{CONJUGATIONS_NAMES[class_choice]}/{row[1]}")
+            assert c == class_choice and lemma.translation == row[1] and lemma.lemma_form
+            assert (class_choice, lemma) in index.index[lemma.lemma_form]
+
+
+def test_inflect_many_matches_paradigms():
+    index = Lemmas_Index(bench_lemmas_dicts())
+    for key in ['Transitive/write', 'Indirect/love', 'Stative/called', 'Stative/held']:
+        class_choice, lemma = index.resolve(key)
+        paradigm = list(index.conjugations[class_choice].iter_forms(lemma))
+        queries = [(key, cell_tags(record_cell(record))) for record in paradigm]
+        assert index.inflect_many(queries) == [record.form for record in paradigm]
+
+
+def test_failed_lemma_is_not_indexed():
+    lemmas_dicts = bench_lemmas_dicts()
+    def broken_lemma_form(screeves): raise TypeError("malformed row")
+    lemmas_dicts[4][1].gen_lemma_form = broken_lemma_form # 'called'
+    index = Lemmas_Index(lemmas_dicts)
+    assert list(index.failed) == ['Stative/called'] and 'TypeError' in index.failed['Stative/called']
+    with pytest.raises(KeyError, match="malformed row"):
+        index.resolve('called')
+    assert index.resolve('Stative/held')[1].translation == 'held'
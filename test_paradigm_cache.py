@@ -0,0 +1,25 @@
+__author__ = "David Guriel"
+from CleanParadigms_main import CONJUGATIONS_NAMES
+from paradigm_cache import Paradigm_Cache
+from test_inflection import bench_lemmas_dicts
+
+
+def test_cache_all_classes():
+    lemmas_dicts = bench_lemmas_dicts()
+    cache = Paradigm_Cache(lemmas_dicts, max_entries=4)
+    keys = [f"{CONJUGATIONS_NAMES[class_choice]}/{lemma.translation}" for class_choice, lemmas in enumerate(lemmas_dicts) for lemma in lemmas.values()]
+    for key in keys:
+        paradigm = cache.get_paradigm(key)
+        assert paradigm and cache.get_paradigm(key) is paradigm
+    assert all(record.object is None for record in cache.get_paradigm('Stative/held'))
+    stats = cache.stats()
+    assert stats['failed'] == 0 and stats['entries'] == 4 and stats['misses'] == len(keys) and stats['evictions'] == len(keys) - 4
+
+
+def test_failed_lemma_is_skipped():
+    lemmas_dicts = bench_lemmas_dicts()
+    def broken_lemma_form(screeves): raise TypeError("malformed row")
+    lemmas_dicts[4][2].gen_lemma_form = broken_lemma_form # 'held'
+    cache = Paradigm_Cache(lemmas_dicts)
+    assert cache.stats()['failed'] == 1 and list(cache.failed) == ['Stative/held']
+    assert cache.get_paradigm('Stative/called')
@@ -1,8 +1,10 @@
 __author__ = "David Guriel"
 import sys
 import string
+import re
 import os
 from copy import deepcopy
+from collections import namedtuple
 
 misc = ['', ' ', '\xa0'] + list(string.punctuation + string.ascii_lowercase + string.ascii_uppercase + string.digits)
 kat2eng = dict(zip(['ა', 'ბ', 'გ', 'დ', 'ე', 'ვ', 'ზ', 'თ', 'ი', 'კ', 'ლ', 'მ', 'ნ', 'ო', 'პ', 'ჟ', 'რ', 'ს', 'ტ', 'უ', 'ფ', 'ქ', 'ღ', 'ყ', 'შ', 'ჩ', 'ც', 'ძ', 'წ', 'ჭ', 'ხ', 'ჯ', 'ჰ']+misc,
@@ -18,26 +20,93 @@ SCREEVES_NAMES = ['Present Indicative', 'Imperfect Indicative', 'Present Subjunc
                   'Aorist Indicative', 'Aorist Subjunctive',
                   'Perfect Indicative', 'Pluperfect', 'Perfect Subjunctive']
 
-def transliterate_kat2eng(kat_word): return ''.join([kat2eng[c] for c in list(kat_word)])
-def transliterate_eng2kat(eng_word): # requires a bit more attention, due to apostrophe (') issues.
-    kat_chars_list = list()
-    for i in range(len(eng_word)):
-        if eng_word[i]=="'":
-            continue
-        elif eng_word[i] not in eng2kat: # e.g. "q'"
-            kat_char = eng2kat[eng_word[i]+"'"]
-        else:
-            if i+1<len(eng_word):
-                if eng_word[i+1]=="'":
-                    kat_char = eng2kat[eng_word[i]+"'"]
-                else:
-                    kat_char = eng2kat[eng_word[i]]
-            else:
-                kat_char = eng2kat[eng_word[i]]
-        kat_chars_list.append(kat_char)
-    return ''.join(kat_chars_list)
+# Compiled transliteration tables: kat2eng is a single str.translate call. For eng2kat, the apostrophe digraphs (e.g. "q'") are
+# tokenized first by a precompiled regex (greedy - the longest match wins), then the remaining letters are translated and the
+# leftover apostrophes dropped. A letter that only exists as a digraph (e.g. a "q" without an apostrophe) is read as the digraph.
+# Characters outside the tables are kept as they are.
+KAT2ENG_TABLE = str.maketrans({k: v for k, v in kat2eng.items() if len(k) == 1})
+ENG2KAT_DIGRAPHS = {k: v for k, v in eng2kat.items() if len(k) == 2 and k[1] == "'"}
+ENG2KAT_DIGRAPHS_PATTERN = re.compile('|'.join(re.escape(k) for k in ENG2KAT_DIGRAPHS))
+ENG2KAT_TABLE = str.maketrans({**{k[0]: v for k, v in ENG2KAT_DIGRAPHS.items() if k[0] not in eng2kat},
+                               **{k: v for k, v in eng2kat.items() if len(k) == 1 and k != "'"}, "'": None})
+
+def transliterate_kat2eng(kat_word): return kat_word.translate(KAT2ENG_TABLE)
+def transliterate_eng2kat(eng_word):
+    return ENG2KAT_DIGRAPHS_PATTERN.sub(lambda m: ENG2KAT_DIGRAPHS[m.group()], eng_word).translate(ENG2KAT_TABLE)
+
+TRANSLITERATIONS = {'kat2eng': transliterate_kat2eng, 'eng2kat': transliterate_eng2kat}
+
+def transliterate_many(words, direction='kat2eng'):
+    """transliterates a list of words; direction is 'kat2eng' or 'eng2kat'"""
+    if direction == 'kat2eng': # a single translate over the joined words is faster than one call per word
+        joined = '\n'.join(words)
+        if joined.count('\n') == len(words) - 1: # i.e. no word has newlines of its own, which would split it
+            return joined.translate(KAT2ENG_TABLE).split('\n')
+        return [transliterate_kat2eng(word) for word in words]
+    return [transliterate_eng2kat(word) for word in words]
+
+def transliterate_column(rows, column=1, direction='kat2eng'):
+    """yields the rows (tuples, e.g. from read_dataset_lines) with one of their columns transliterated - by default the form"""
+    transliterate = TRANSLITERATIONS[direction]
+    for row in rows:
+        yield row[:column] + (transliterate(row[column]),) + row[column+1:]
+
+def transliterate_file(in_path, out_path, direction='kat2eng', chunk_size=1<<20):
+    """transliterates a whole text file, a chunk of whole lines (~chunk_size characters) at a time"""
+    transliterate = TRANSLITERATIONS[direction]
+    with open(in_path, 'r', encoding='utf8') as f, open(out_path, 'w', encoding='utf8') as fout:
+        while True:
+            chunk = f.readlines(chunk_size)
+            if not chunk: break
+            fout.write(transliterate(''.join(chunk)))
 
 def format_pronouns(key): return "{};{}".format(key[2],str.upper(key[:2]))
+def format_pronouns_schema2(key, role): return "{0}{1};{0}{2}".format(role, key[2], str.upper(key[:2])) # role is 's' (subject) or 'o' (object), as in katVerbsCompleteDataset.txt
+
+# A single generated form. screeve is the screeve's index (1-11), 'IMP' or 'MSDR'. subject & object are pronoun keys ('sg1'..'pl3'),
+# and are None for Masdars, whose aspect ('PRF' / 'IPFV') is given instead. object is also None in the Stative forms, which
+# agree with the subject only.
+FormRecord = namedtuple('FormRecord', ['lemma_form', 'form', 'subject', 'object', 'screeve', 'aspect'], defaults=[None])
+
+def format_record(record:FormRecord, use_unimorph_format:bool, verbose:bool, transliteration=None):
+    """
+    returns the line of the record, as written in the Clean Paradigms files
+    :param transliteration: the form's transliteration, for the verbose lines, if already computed (e.g. for a batch of forms)
+    """
+    if record.screeve == 'MSDR':
+        if use_unimorph_format: return f"{record.lemma_form}\t{record.form}\tV;V.MSDR;{record.aspect}\n"
+        return f"Masdar form, {MASDARS_NAMES[record.aspect]}: {record.form}\n"
+    eng_form = " = {}".format(transliterate_kat2eng(record.form) if transliteration is None else transliteration) if verbose else ''
+    if record.screeve == 'IMP':
+        if use_unimorph_format: return f"{record.lemma_form}\t{record.form}\tV;{format_pronouns(record.subject)};{format_pronouns(record.object)};IMP{eng_form}\n"
+        return f"Imperative form, {record.subject},{record.object}: {record.form}{eng_form}\n"
+    if use_unimorph_format:
+        pronouns = format_pronouns(record.subject) + (f";{format_pronouns(record.object)}" if record.object is not None else '')
+        return f"{record.lemma_form}\t{record.form}\tV;{pronouns};{screeves_formats[record.screeve]}{eng_form}\n"
+    return f"{record.form}{eng_form}\n"
+
+MASDARS_NAMES = {'PRF': 'Perfective', 'IPFV': 'Imperfective'}
+
+def format_record_schema2(record:FormRecord):
+    """returns the line of the record, as written in katVerbsCompleteDataset.txt and 'Final Tables By Classes'"""
+    if record.screeve == 'MSDR': return f"{record.lemma_form}\t{record.form}\tV;V.MSDR;{record.aspect}\n"
+    screeve = 'IMP' if record.screeve == 'IMP' else screeves_formats[record.screeve]
+    pronouns = format_pronouns_schema2(record.subject, 's') + (f";{format_pronouns_schema2(record.object, 'o')}" if record.object is not None else '')
+    return f"{record.lemma_form}\t{record.form}\tV;{pronouns};{screeve}\n"
+
+def read_dataset_lines(file_path):
+    """yields the (lemma, form, tags) triplets of a dataset file in the format of katVerbsCompleteDataset.txt"""
+    with open(file_path, 'r', encoding='utf8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line == '': continue
+            lemma, form, tags = line.split('\t')
+            yield lemma, form, tags
+
+def write_dataset_lines(rows, out_path):
+    with open(out_path, 'w', encoding='utf8') as f:
+        for lemma, form, tags in rows:
+            f.write(f"{lemma}\t{form}\t{tags}\n")
 
 def zip_paas(vals): return dict(zip(['pref','suff'], vals))
 def zip_pronouns_paas(vals): return dict(zip(['sg1','sg2','sg3','pl1','pl2','pl3'],[zip_paas(paa) for paa in vals]))
@@ -72,13 +141,23 @@ def zip_ext_pronouns_paas(vals, mode='paas'):
 
 SUBJECTIVE_VERSION = ['ი', 'ი', 'უ', 'ი', 'ი', 'უ']
 
+_SCREEVE_MARKERS = {} # (vals, mode) -> the markers' dictionary, shared by all the callers - it is never modified
+
 def set_screeve_markers(vals, mode:str):
     """
-    returns an extended dictionary of markers per Screeve.
+    returns an extended dictionary of markers per Screeve. The dictionaries of lists of strings are shared between the calls
+    with equal values (e.g. the versions of many lemmas), so they must not be modified.
     :param vals: a list. Can be of type [str], [[str]] or dict()
     :param mode: 'subj' - varies per subject (standard), 'obj' - varies per object (mostly in Inversion), 'manual' - returns the list as is
     :return: application of zip_pronouns, for simple execution in the main forms generating loop
     """
+    if mode in {'subj', 'obj'} and all(isinstance(v, str) for v in vals):
+        key = (tuple(vals), mode)
+        if key not in _SCREEVE_MARKERS: _SCREEVE_MARKERS[key] = _set_screeve_markers(vals, mode)
+        return _SCREEVE_MARKERS[key]
+    return _set_screeve_markers(vals, mode)
+
+def _set_screeve_markers(vals, mode):
     if mode=='subj':
         res = zip_pronouns([zip_pronouns(vals) for _ in range(6)])
     elif mode=='obj':
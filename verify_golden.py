@@ -0,0 +1,117 @@
+__author__ = "David Guriel"
+import os
+import sys
+import hashlib
+from collections import Counter
+from CleanParadigms_main import CONJUGATIONS_NAMES, get_conjugation, read_lemmas, select_lemmas
+from utils import format_record_schema2, read_dataset_lines
+
+GOLDEN_DATASET = "katVerbsCompleteDataset.txt"
+GOLDEN_TABLES_DIR = "Final Tables By Classes"
+
+
+def multiset_hash(cells:Counter):
+    """an order-independent hash of a multiset of (form, tags) cells"""
+    h = hashlib.sha256()
+    for (form, tags), count in sorted(cells.items()):
+        h.update(f"{form}\t{tags}\t{count}\n".encode('utf8'))
+    return h.hexdigest()
+
+
+def golden_multisets(file_path):
+    """returns {lemma_form: Counter of its (form, tags) cells} of a golden file"""
+    res = {}
+    for lemma_form, form, tags in read_dataset_lines(file_path):
+        res.setdefault(lemma_form, Counter())[form, tags] += 1
+    return res
+
+
+def _generate_cells(job):
+    # the cells of a lemma's paradigm, with the tags of the golden files
+    class_choice, lemma = job
+    cells = Counter()
+    for record in get_conjugation(class_choice).iter_forms(lemma):
+        _, form, tags = format_record_schema2(record).rstrip('\n').split('\t')
+        cells[form, tags] += 1
+    return lemma.lemma_form, cells, multiset_hash(cells)
+
+
+def generate_multisets(jobs, workers=None):
+    """regenerates the (class_choice, lemma) pairs in memory over a process pool; returns [(class_choice, lemma, lemma_form, cells, hash)]"""
+    if workers == 1:
+        results = map(_generate_cells, jobs)
+        return [(c, lemma) + res for (c, lemma), res in zip(jobs, results)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_generate_cells, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1))))
+        return [(c, lemma) + res for (c, lemma), res in zip(jobs, results)]
+
+
+def compare_to_golden(generated, golden, complete=False):
+    """
+    Compares the generated lemmas to a golden file's, by their hashes - the cells are compared only for lemmas that differ.
+    :param generated: [(class_choice, lemma, lemma_form, cells, hash)], of the lemmas that should be in the golden file
+    :param complete: whether generated covers the whole lexicon, so that golden lemmas that weren't generated are also reported
+    :return: a list of (lemma_form, description, missing cells, extra cells) of the lemmas that differ
+    """
+    diffs = []
+    for class_choice, lemma, lemma_form, cells, h in generated:
+        description = f"{CONJUGATIONS_NAMES[class_choice]}/{lemma.translation}"
+        if lemma_form not in golden:
+            diffs.append((lemma_form, description + " - not in the golden file", Counter(), cells))
+        elif multiset_hash(golden[lemma_form]) != h:
+            diffs.append((lemma_form, description, golden[lemma_form] - cells, cells - golden[lemma_form]))
+    if complete:
+        generated_forms = {lemma_form for _, _, lemma_form, _, _ in generated}
+        for lemma_form in golden:
+            if lemma_form not in generated_forms:
+                diffs.append((lemma_form, "not generated", golden[lemma_form], Counter()))
+    return diffs
+
+
+def verify(jobs, dataset_path=GOLDEN_DATASET, tables_dir=GOLDEN_TABLES_DIR, workers=None, complete=False, out=sys.stdout):
+    """
+    Regenerates the lemmas in memory and compares them to the golden dataset and to the golden table of every class, printing
+    only the lemmas and cells that differ. Returns the number of differing lemmas.
+    """
+    generated = generate_multisets(jobs, workers)
+    checks = []
+    if dataset_path is not None:
+        checks.append((dataset_path, generated))
+    if tables_dir is not None:
+        for class_choice, class_name in enumerate(CONJUGATIONS_NAMES):
+            class_generated = [g for g in generated if g[0] == class_choice]
+            table_path = os.path.join(tables_dir, class_name + ".schema2.txt")
+            if class_generated or complete and os.path.isfile(table_path):
+                checks.append((table_path, class_generated))
+
+    n_diffs = 0
+    for file_path, file_generated in checks:
+        diffs = compare_to_golden(file_generated, golden_multisets(file_path), complete)
+        n_diffs += len(diffs)
+        for lemma_form, description, missing, extra in diffs:
+            out.write(f"{file_path}: {lemma_form} ({description})\n")
+            for (form, tags), count in sorted(missing.items()):
+                out.write(f"  - {form}\t{tags}" + (f" (x{count})" if count > 1 else '') + "\n")
+            for (form, tags), count in sorted(extra.items()):
+                out.write(f"  + {form}\t{tags}" + (f" (x{count})" if count > 1 else '') + "\n")
+        out.write(f"{file_path}: {len(file_generated)} lemmas checked, {len(diffs)} differ\n")
+    return n_diffs
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Regenerates the lemmas in memory and compares them to the golden files. "
+                                                 "'-' lines are golden cells that weren't generated, '+' lines are generated cells that aren't in the golden file.")
+    parser.add_argument("--file_path", required=True, help="The Excel file from which to read the lemmas' data")
+    parser.add_argument('-c', '--classes', nargs='+', help="Check only these classes (names like Transitive, or indices 0-4)")
+    parser.add_argument('-t', '--translations', nargs='+', help="Check only the lemmas with these translations (e.g. write)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--dataset", default=GOLDEN_DATASET, help="The golden complete dataset ('' to skip it)")
+    parser.add_argument("--tables", default=GOLDEN_TABLES_DIR, help="The directory of the golden tables ('' to skip them)")
+    args = parser.parse_args()
+
+    jobs = select_lemmas(read_lemmas(args.file_path), args.classes, None, args.translations and set(args.translations))
+    complete = not (args.classes or args.translations)
+    n_diffs = verify(jobs, args.dataset or None, args.tables or None, args.workers, complete)
+    sys.exit(1 if n_diffs else 0)